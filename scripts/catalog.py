@@ -0,0 +1,34 @@
+import argparse
+from internal.settings import *
+from internal.benchmark import *
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manages the compiled catalog of the benchmarks, a single file containing the metadata "
+                                                 "of all benchmarks (index files, instances, file digests and jani features) that is loaded "
+                                                 "by run.py and postprocess.py instead of parsing all index files. The catalog is ignored as "
+                                                 "soon as an index file changes. Usage: 'python3 catalog.py build'")
+    parser.add_argument('command', choices=["build", "check"],
+                        help="'build' compiles the catalog, 'check' tests whether the catalog is up to date.")
+    parser.add_argument('-o', '--output',
+                        help="The catalog file. Defaults to 'catalog.json' in the benchmark directory. Usage: -o <filename>",
+                        required=False)
+    args = parser.parse_args()
+
+    # the task and the results directory are irrelevant for the benchmarks
+    settings = Settings("stationary", "results")
+    if args.output is not None:
+        settings.json_data["benchmark-catalog"] = args.output
+    if args.command == "build":
+        start_time = time.monotonic()
+        num_models, num_instances = build_benchmark_catalog(settings)
+        print("Compiled the catalog of {} models with {} instances to '{}' in {:.1f}s.".format(
+            num_models, num_instances, settings.benchmark_catalog(), time.monotonic() - start_time))
+    else:
+        catalog = BenchmarkCatalog(settings)
+        if not os.path.isfile(set_artifact_dir(settings.benchmark_catalog())):
+            print("There is no catalog '{}'.".format(settings.benchmark_catalog()))
+            sys.exit(1)
+        if not catalog._load_compiled():
+            sys.exit(1)
+        print("The catalog '{}' is up to date ({} models).".format(settings.benchmark_catalog(), len(catalog.models)))
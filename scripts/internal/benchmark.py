@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 from .utility import *
+import threading, hashlib
+
+CATALOG_VERSION = 1
 
 class Benchmark(object):
     """ This class represents a benchmark, that is
@@ -65,6 +68,18 @@ class Benchmark(object):
             par_val_string = par_val_string + value_str
         return par_val_string
 
+    def get_num_states(self):
+        """ Returns the number of states as stated in the index file of the model or None if it is unknown. """
+        file_json = self.index_json["files"][self.model_file_index]
+        if "open-parameter-values" in file_json and len(file_json["open-parameter-values"]) > 0:
+            states_json = file_json["open-parameter-values"][self.open_parameter_index].get("states", [])
+        else:
+            states_json = file_json.get("states", [])
+        for entry in states_json:
+            if "number" in entry:
+                return int(entry["number"])
+        return None
+
     def get_model_short_name(self):
         return self.index_json["short"]
 
@@ -108,7 +123,8 @@ class Benchmark(object):
         result = self.index_json["files"][self.model_file_index]["original-file"]
         if isinstance(result, str):
             result = [result]
-        return result
+        # the index json is shared by all benchmarks of the model (see BenchmarkCatalog), so we return a copy
+        return list(result)
 
     def get_all_filenames(self):
         list = self.get_original_filename()
@@ -152,28 +168,17 @@ class Benchmark(object):
 
     def get_jani_features(self):
         """ Returns the list of jani features """
+        features = get_benchmark_catalog(self.settings).get_jani_features(os.path.join(self.get_directory(), self.get_jani_filename()))
+        if features is not None:
+            return features
         model_jani = self.load_jani_file()
         if "features" in model_jani:
             return model_jani["features"]
         return []
 
 
-def get_benchmark_from_id(settings, id):
-    """ Returns the benchmark object associated with the given identifier """
-    short_name = id.split(".")[0]
-    id = "" if id == short_name else id[len(short_name)+1:]
-
-    # find the correct benchmark
-    benchmark_directories = load_json(os.path.join(settings.benchmark_dir(), "index.json"))
-    model_index_json = None
-    for p in benchmark_directories:
-        model_path = os.path.join(settings.benchmark_dir(), p["path"])
-        # get the correct index.json file
-        if short_name == os.path.basename(model_path):
-            model_index_json = load_json(os.path.join(model_path, "index.json"))
-            break
-    if model_index_json is None: raise LookupError("Unable to find benchmark with name '{}'.".format(short_name))
-
+def _find_benchmark(settings, model_index_json, short_name, id):
+    """ Searches the benchmark with the given identifier (without the short name) in the index json of the model. """
     # get the property
     property_str = None
     if "properties" in model_index_json and id.startswith("property"):
@@ -224,6 +229,215 @@ def get_benchmark_from_id(settings, id):
     raise LookupError("Unable to find parameter definition '{}' for model '{}'.".format(parameter_definition, short_name))
 
 
+def _get_value_string(value):
+    return str(value).lower() if type(value) is bool else str(value)
+
 
+def _get_file_stamp(path):
+    """ Returns size and modification time of the given file (or None if it does not exist), which are used to detect changes. """
+    try:
+        stat = os.stat(set_artifact_dir(path))
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
 
 
+class BenchmarkCatalog(object):
+    """
+    Index of the benchmarks in the benchmark directory. Each index file (the one of the benchmark directory and those of
+    the models) is parsed at most once. For each model, the benchmarks are indexed by property and parameter values
+    and the Benchmark objects are memoized, i.e., looking up a benchmark identifier a second time is a dictionary lookup.
+    If there is an up-to-date compiled catalog (see build_benchmark_catalog), it is loaded instead of the index files.
+    It also provides the digests of the model files and the jani features.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.RLock()
+        self.model_paths = None  # short name -> directory of the model
+        self.models = dict()  # short name -> (index json, dict from parameter values string to (file index, open parameter index))
+        self.benchmarks = dict()  # identifier -> Benchmark
+        self.files = dict()  # path (relative to the benchmark directory) -> record of the compiled catalog
+
+    def _load_compiled(self):
+        """ Loads the compiled catalog. Returns False if there is none or if one of the index files changed since its build. """
+        path = self.settings.benchmark_catalog()
+        if path is None or not os.path.isfile(set_artifact_dir(path)):
+            return False
+        try:
+            catalog_json = load_json(path)
+        except ValueError:
+            return False
+        if catalog_json.get("version") != CATALOG_VERSION:
+            return False
+        for source, stamp in catalog_json["sources"].items():
+            if _get_file_stamp(os.path.join(self.settings.benchmark_dir(), source)) == stamp:
+                continue
+            print("WARN: Ignoring the benchmark catalog '{}' since '{}' changed. Rebuild it via 'python3 catalog.py build'.".format(
+                path, source))
+            return False
+        self.model_paths = dict()
+        for short_name, model_json in catalog_json["models"].items():
+            self.model_paths[short_name] = os.path.join(self.settings.benchmark_dir(), model_json["path"])
+            self.models[short_name] = (model_json["index"], dict(
+                (key, (instance["file-index"], instance["open-parameter-index"])) for key, instance in model_json["instances"].items()))
+        self.files = catalog_json["files"]
+        return True
+
+    def _get_file_record(self, path):
+        """ Returns the record of the given file in the compiled catalog (or None if there is none or the file changed). """
+        with self.lock:
+            self._get_model_paths()
+        relative_path = os.path.relpath(os.path.realpath(set_artifact_dir(path)),
+                                        os.path.realpath(set_artifact_dir(self.settings.benchmark_dir())))
+        record = self.files.get(relative_path)
+        if record is None or _get_file_stamp(path) != record["stamp"]:
+            return None
+        return record
+
+    def get_file_digest(self, path):
+        """ Returns the sha256 digest of the given model file according to the compiled catalog (or None if unknown). """
+        record = self._get_file_record(path)
+        return record["sha256"] if record is not None else None
+
+    def get_jani_features(self, path):
+        """ Returns the features of the given jani file according to the compiled catalog (or None if unknown). """
+        record = self._get_file_record(path)
+        return record.get("jani-features") if record is not None else None
+
+    def _get_model_paths(self):
+        if self.model_paths is None and not self._load_compiled():
+            self.model_paths = dict()
+            for p in load_json(os.path.join(self.settings.benchmark_dir(), "index.json")):
+                model_path = os.path.join(self.settings.benchmark_dir(), p["path"])
+                # as for a linear search, the first model with the short name is used
+                self.model_paths.setdefault(os.path.basename(model_path), model_path)
+        return self.model_paths
+
+    def _get_model(self, short_name):
+        if short_name not in self.models:
+            model_path = self._get_model_paths().get(short_name)
+            if model_path is None: raise LookupError("Unable to find benchmark with name '{}'.".format(short_name))
+            self.models[short_name] = self._index_model(load_json(os.path.join(model_path, "index.json")))
+        return self.models[short_name]
+
+    def _index_model(self, model_index_json):
+        parameter_names = [p["name"] for p in model_index_json["parameters"]]
+        instances = dict()
+        for model_file_index, file_info in enumerate(model_index_json["files"]):
+            open_param_values = file_info.get("open-parameter-values", [])
+            for open_parameter_index in range(max(1, len(open_param_values))):
+                values = dict()
+                for par_val in file_info.get("file-parameter-values", []):
+                    values[par_val["name"]] = _get_value_string(par_val["value"])
+                if len(open_param_values) > 0:
+                    for par_val in open_param_values[open_parameter_index].get("values", []):
+                        values[par_val["name"]] = _get_value_string(par_val["value"])
+                if sorted(values.keys()) != sorted(parameter_names):
+                    # not all parameters are defined, such instances are only found by a linear search
+                    continue
+                # as for a linear search, the first matching instance is used
+                instances.setdefault("-".join(values[name] for name in parameter_names),
+                                     (model_file_index, open_parameter_index))
+        return model_index_json, instances
+
+    def get_benchmark(self, id):
+        """ Returns the benchmark object associated with the given identifier """
+        with self.lock:
+            if id not in self.benchmarks:
+                self.benchmarks[id] = self._lookup(id)
+            return self.benchmarks[id]
+
+    def _lookup(self, id):
+        short_name = id.split(".")[0]
+        model_index_json, instances = self._get_model(short_name)
+        remainder = "" if id == short_name else id[len(short_name)+1:]
+        property_str = None
+        if "properties" in model_index_json and remainder.startswith("property"):
+            for prop in model_index_json["properties"]:
+                if remainder[len("property"):].startswith(prop + "."):
+                    property_str = prop
+                    remainder = remainder[len("property") + len(prop) + 1:]
+                    break
+        key = "-".join(v.strip() for v in remainder.strip().split("-"))
+        if (property_str is not None or not remainder.startswith("property")) and key in instances:
+            model_file_index, open_parameter_index = instances[key]
+            return Benchmark(self.settings, model_index_json, model_file_index, open_parameter_index, property_str)
+        return _find_benchmark(self.settings, model_index_json, short_name, "" if id == short_name else id[len(short_name)+1:])
+
+
+_catalogs_lock = threading.Lock()
+_catalogs = dict()  # benchmark directory -> BenchmarkCatalog
+
+
+def get_benchmark_catalog(settings):
+    """ Returns the (shared) catalog of the benchmark directory of the given settings. """
+    benchmark_dir = os.path.realpath(set_artifact_dir(settings.benchmark_dir()))
+    with _catalogs_lock:
+        if benchmark_dir not in _catalogs:
+            _catalogs[benchmark_dir] = BenchmarkCatalog(settings)
+        return _catalogs[benchmark_dir]
+
+
+def get_benchmark_from_id(settings, id):
+    """ Returns the benchmark object associated with the given identifier """
+    return get_benchmark_catalog(settings).get_benchmark(id)
+
+
+def build_benchmark_catalog(settings, path=None):
+    """
+    Compiles the metadata of all benchmarks into a single file (per default the catalog file of the settings), i.e.,
+        * sources:  size and modification time of the index files, if any of them changes, the catalog is ignored
+        * models:   for each model its directory, index json, properties, categories and its instances (the files,
+                    parameter values and number of states of each combination of file and open parameter values)
+        * files:    size, modification time and sha256 digest of each model file (and the features of jani files)
+    Returns the number of models and the number of instances.
+    """
+    if path is None:
+        path = settings.benchmark_catalog()
+    benchmark_dir = settings.benchmark_dir()
+    catalog_json = OrderedDict([("version", CATALOG_VERSION), ("sources", OrderedDict()), ("models", OrderedDict()),
+                                ("files", OrderedDict())])
+    catalog_json["sources"]["index.json"] = _get_file_stamp(os.path.join(benchmark_dir, "index.json"))
+    num_instances = 0
+    for p in load_json(os.path.join(benchmark_dir, "index.json")):
+        short_name = os.path.basename(os.path.join(benchmark_dir, p["path"]))
+        if short_name in catalog_json["models"]:
+            continue
+        index_path = os.path.join(p["path"], "index.json")
+        catalog_json["sources"][index_path] = _get_file_stamp(os.path.join(benchmark_dir, index_path))
+        if catalog_json["sources"][index_path] is None:
+            # models without index file can not be found, but the catalog becomes outdated once the index file is added
+            continue
+        model_index_json, instances = BenchmarkCatalog(settings)._index_model(load_json(os.path.join(benchmark_dir, index_path)))
+        model_json = OrderedDict([("path", p["path"]), ("properties", model_index_json.get("properties", [])),
+                                  ("evt-category", model_index_json.get("evt-category", "unknown")),
+                                  ("stationary-category", model_index_json.get("stationary-category", "unknown")),
+                                  ("instances", OrderedDict()), ("index", model_index_json)])
+        for key, (model_file_index, open_parameter_index) in instances.items():
+            benchmark = Benchmark(settings, model_index_json, model_file_index, open_parameter_index, None)
+            model_json["instances"][key] = OrderedDict([
+                ("file-index", model_file_index), ("open-parameter-index", open_parameter_index),
+                ("files", benchmark.get_all_filenames()),
+                ("parameters", OrderedDict((par["name"], par["value"]) for par in benchmark.get_parameters())),
+                ("states", benchmark.get_num_states())])
+            num_instances += 1
+            for filename in benchmark.get_all_filenames():
+                relative_path = os.path.join(p["path"], filename)
+                stamp = _get_file_stamp(os.path.join(benchmark_dir, relative_path))
+                if relative_path in catalog_json["files"] or stamp is None:
+                    continue
+                record = OrderedDict([("stamp", stamp)])
+                sha = hashlib.sha256()
+                with open(set_artifact_dir(os.path.join(benchmark_dir, relative_path)), 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        sha.update(chunk)
+                record["sha256"] = sha.hexdigest()
+                if filename.lower().endswith(".jani"):
+                    record["jani-features"] = benchmark.load_jani_file().get("features", [])
+                catalog_json["files"][relative_path] = record
+        catalog_json["models"][short_name] = model_json
+    # the catalog is only read by programs, so we save space by omitting the indention
+    with open_atomic(path, encoding="utf-8") as catalog_file:
+        json.dump(catalog_json, catalog_file, ensure_ascii=False, separators=(",", ":"))
+    return len(catalog_json["models"]), num_instances
@@ -0,0 +1,93 @@
+from .utility import *
+from .execution import CommandExecution
+import threading
+
+CONTAINER_RUNTIMES = ["apptainer", "singularity"]
+INSTANCE_TIME_LIMIT = 120  # in seconds, for starting and stopping an instance
+
+
+def parse_container_command(command: str):
+    """
+    Splits a command of a containerized tool, e.g. 'apptainer run -e image.sif sds ...', into the runtime, the action
+    ('run' or 'exec'), the options, the container image and the arguments. Returns None for other commands.
+    """
+    tokens = command.split()
+    if len(tokens) < 3 or os.path.basename(tokens[0]) not in CONTAINER_RUNTIMES or tokens[1] not in ["run", "exec"]:
+        return None
+    for i in range(2, len(tokens)):
+        if tokens[i].endswith(".sif"):
+            return tokens[0], tokens[1], tokens[2:i], tokens[i], tokens[i + 1:]
+    return None
+
+
+class ContainerInstances(object):
+    """
+    Persistent container instances ('apptainer instance start') for containerized tools. Without them, each invocation
+    (and each warm-up run) sets up the container again. With them, each worker starts one instance per container image
+    (and options) and the invocations are executed inside it ('apptainer run/exec instance://<name> ...'). The processes
+    started inside the instance are children of the exec call, hence they are pinned and limited like other tools.
+    The time for starting an instance and the overhead of executing a trivial command inside it are measured once and
+    recorded separately from the wall time of the invocations. If an instance can not be started, the invocations of the
+    image are executed unchanged.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.instances = OrderedDict()  # (worker index, runtime, options, image) -> instance info or None if the start failed
+
+    def _run(self, command):
+        command_execution = CommandExecution()
+        command_execution.run(command, INSTANCE_TIME_LIMIT)
+        success = not command_execution.timeout and command_execution.return_code == 0
+        return success, command_execution
+
+    def _start(self, worker_index, runtime, options, image):
+        name = "bench-{}-{}-{}".format(os.getpid(), worker_index, len(self.instances))
+        success, command_execution = self._run(" ".join([runtime, "instance", "start"] + options + [image, name]))
+        if not success:
+            print("\nWARN: Unable to start a container instance of '{}', executing its invocations without instance:\n{}".format(
+                image, command_execution.output.strip()))
+            return None
+        info = OrderedDict([("name", name), ("runtime", runtime), ("container-startup-time", command_execution.wall_time)])
+        # the remaining overhead of each invocation, i.e., entering the running instance
+        success, command_execution = self._run(" ".join([runtime, "exec"] + options + ["instance://" + name, "true"]))
+        if success:
+            info["container-exec-time"] = command_execution.wall_time
+        return info
+
+    def prepare(self, invocation, worker_index):
+        """
+        Changes the command of the given invocation such that it is executed inside the instance of the given worker,
+        which is started if necessary. Returns the instance info (name and times) or None if the command is unchanged.
+        """
+        parsed = parse_container_command(set_artifact_dir(invocation.command))
+        if parsed is None:
+            return None
+        runtime, action, options, image, arguments = parsed
+        key = (worker_index, runtime, tuple(options), image)
+        # each worker only uses its own instances, so no other thread starts the same instance
+        with self.lock:
+            known = key in self.instances
+        if not known:
+            info = self._start(worker_index, runtime, options, image)
+            with self.lock:
+                self.instances[key] = info
+        info = self.instances[key]
+        if info is None:
+            return None
+        invocation.command = " ".join([runtime, action] + options + ["instance://" + info["name"]] + arguments)
+        return info
+
+    def stop_all(self):
+        """ Stops all instances that were started. """
+        with self.lock:
+            instances = [info for info in self.instances.values() if info is not None]
+            self.instances.clear()
+        for info in instances:
+            success, command_execution = self._run(" ".join([info["runtime"], "instance", "stop", info["name"]]))
+            if not success:
+                print("WARN: Unable to stop the container instance '{}':\n{}".format(info["name"], command_execution.output.strip()))
+        if len(instances) > 0:
+            print("Stopped {} container instances (total startup time {:.1f}s).".format(
+                len(instances), sum(info["container-startup-time"] for info in instances)))
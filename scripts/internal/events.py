@@ -0,0 +1,116 @@
+from .utility import *
+from .journal import get_result_status
+import socket, threading
+
+
+class EventLog(object):
+    """
+    Machine-readable log of the execution (one json object per line) in the results directory, e.g. for monitoring.
+    Each event has a timestamp, the host, the process id and the type of the event:
+        * run-started:          number of invocations and workers
+        * invocation-started:   identifier, worker and predicted wallclock time
+        * invocation-finished:  identifier, worker, status (ok, timeout, memout, error), wallclock time and peak memory
+                                (and whether the result was pruned or taken from the result cache)
+        * run-finished / run-interrupted: number of finished invocations
+    Multiple processes (e.g. shards or queue workers) can append to the same log.
+    """
+
+    def __init__(self, settings):
+        self.path = set_artifact_dir(os.path.join(settings.results_dir(), "events.jsonl"))
+        self.lock = threading.Lock()
+        self.host = socket.gethostname()
+
+    def emit(self, event, **values):
+        entry = OrderedDict([("time", time.time()), ("host", self.host), ("pid", os.getpid()), ("event", event)])
+        for key, value in values.items():
+            if value is not None:
+                entry[key.replace("_", "-")] = value
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding="utf-8") as event_file:
+                event_file.write(line)
+
+    def invocation_started(self, invocation, worker=None, predicted_time=None):
+        self.emit("invocation-started", identifier=invocation.get_identifier(), worker=worker,
+                  predicted_wallclock_time=predicted_time)
+
+    def invocation_finished(self, invocation, result_json, worker=None):
+        self.emit("invocation-finished", identifier=invocation.get_identifier(), worker=worker,
+                  status=get_result_status(result_json), pruned=result_json.get("pruned"), cached=result_json.get("cached"),
+                  wallclock_time=try_to_float(result_json.get("wallclock-time")),
+                  peak_rss=try_to_float(result_json.get("peak-rss")))
+
+
+def format_duration(seconds):
+    """ Formats a duration like '2h05m', '3m12s' or '7s'. """
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return "{}h{:02d}m".format(seconds // 3600, (seconds % 3600) // 60)
+    if seconds >= 60:
+        return "{}m{:02d}s".format(seconds // 60, seconds % 60)
+    return "{}s".format(seconds)
+
+
+class ProgressView(object):
+    """
+    Compact progress output with throughput and an estimated time of arrival (ETA).
+    The ETA is the predicted runtime of the remaining invocations divided by the number of workers, where predictions are
+    corrected by the ratio of actual and predicted runtimes of the finished invocations.
+    On a terminal, a single line is updated. Otherwise (e.g. in SLURM output files), one line is printed per finished invocation.
+    If total is None (e.g. for a queue), only finished invocations are counted.
+    """
+
+    def __init__(self, total=None, predicted_times=None, num_workers=1, label="Executing invocations"):
+        self.total = total
+        self.predicted_times = dict(predicted_times) if predicted_times is not None else dict()
+        self.remaining_prediction = sum(self.predicted_times.values())
+        self.num_workers = num_workers
+        self.label = label
+        self.is_tty = sys.stdout.isatty()
+        self.start_time = time.monotonic()
+        self.num_finished = 0
+        self.finished_prediction = 0.0
+        self.finished_actual = 0.0
+        if self.is_tty:
+            sys.stdout.write("\n")
+            self._print(self._status())
+
+    def _status(self):
+        elapsed = time.monotonic() - self.start_time
+        progress = "{}/{}".format(self.num_finished, self.total) if self.total is not None else str(self.num_finished)
+        status = "{}: {} done, elapsed {}".format(self.label, progress, format_duration(elapsed))
+        if self.num_finished > 0 and elapsed > 0:
+            status = status + ", {:.1f}/min".format(self.num_finished * 60.0 / elapsed)
+        if self.total is not None and self.num_finished < self.total and self.remaining_prediction > 0:
+            correction = self.finished_actual / self.finished_prediction if self.finished_prediction > 0 else 1.0
+            status = status + ", ETA {}".format(format_duration(correction * self.remaining_prediction / self.num_workers))
+        return status
+
+    def _print(self, line):
+        if self.is_tty:
+            sys.stdout.write("\r\033[K" + line)
+        else:
+            sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    def finished(self, invocation, result_json):
+        """ Called after each invocation (never concurrently). """
+        self.num_finished += 1
+        identifier = invocation.get_identifier()
+        actual = try_to_float(result_json.get("wallclock-time"))
+        if identifier in self.predicted_times:
+            predicted = self.predicted_times.pop(identifier)
+            self.remaining_prediction = max(0.0, self.remaining_prediction - predicted)
+            if actual is not None and not result_json.get("pruned", False):
+                self.finished_prediction += predicted
+                self.finished_actual += actual
+        if self.is_tty:
+            self._print(self._status())
+        else:
+            self._print("{} | {}: {}{}".format(self._status(), identifier, get_result_status(result_json),
+                                               " ({:.1f}s)".format(actual) if actual is not None else ""))
+
+    def close(self):
+        if self.is_tty:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
@@ -1,5 +1,126 @@
 from .utility import *
-import subprocess, threading, time
+from .limits import MemoryLimit
+import collections, resource, signal, subprocess, threading, time
+
+# seconds a process group gets to shut down after SIGTERM before it is killed via SIGKILL
+TERMINATION_GRACE_PERIOD = 5
+
+# command executions whose processes are currently running (used to clean up on interrupts)
+_running_lock = threading.Lock()
+_running = set()
+
+
+def terminate_running_executions():
+    """ Kills the process groups of all running command executions, e.g., after a KeyboardInterrupt. """
+    with _running_lock:
+        running = list(_running)
+    for command_execution in running:
+        command_execution.terminate(0)
+
+def get_resource_usage(rusage, peak_rss_baseline=None):
+    """
+    Converts the rusage of a reaped process to a dictionary.
+    On Linux, the rusage reported by wait4 includes all descendants of the process that have been waited for,
+    i.e., the whole process tree (e.g. the tool started by an apptainer container).
+    Note that the peak RSS (ru_maxrss) is not the memory of the tool alone: the started process inherits the peak RSS of
+    the harness at the time it was spawned, so it is never below that floor (peak_rss_baseline, in MiB, stored as well).
+    A peak RSS at the baseline only means that the tool needed at most that much. The peak memory of the cgroup (if the
+    memory is limited via cgroups) does not have this floor.
+    """
+    res = OrderedDict()
+    res["peak-rss"] = rusage.ru_maxrss / 1024  # ru_maxrss is in KiB, we store MiB
+    if peak_rss_baseline is not None:
+        res["peak-rss-baseline"] = peak_rss_baseline
+    res["user-time"] = rusage.ru_utime
+    res["system-time"] = rusage.ru_stime
+    res["major-page-faults"] = rusage.ru_majflt
+    res["minor-page-faults"] = rusage.ru_minflt
+    res["voluntary-context-switches"] = rusage.ru_nvcsw
+    res["involuntary-context-switches"] = rusage.ru_nivcsw
+    return res
+
+
+STDERR_SEPARATOR = "\n" + "#" * 30 + "Output to stderr" + "#" * 30 + "\n"
+
+
+def filter_json_export_warnings(line):
+    """ Line filter that drops the (unnecessary) warnings Storm prints for inaccurate values in JSON exports. """
+    return not "WARN (json.hpp:185): Inaccurate JSON export:" in line
+
+
+class OutputBuffer(object):
+    """
+    Keeps the beginning and the end of a stream of lines in memory, at most head_size and tail_size characters, respectively.
+    Tools print their statistics at the beginning and the result and timings at the end, which is all we need for parsing.
+    The complete output can be streamed to a file.
+    """
+
+    def __init__(self, path=None, head_size=1024 * 1024, tail_size=1024 * 1024):
+        self.head = []
+        self.head_length = 0
+        self.tail = collections.deque()
+        self.tail_length = 0
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.length = 0
+        self.omitted = 0
+        self.path = path
+        self.file = None if path is None else open(path, 'w', encoding="utf-8")
+
+    def append(self, line):
+        self.length += len(line)
+        if self.file is not None:
+            self.file.write(line)
+        if self.head_length < self.head_size:
+            if self.head_length + len(line) > self.head_size:
+                self.omitted += self.head_length + len(line) - self.head_size
+                line = line[:self.head_size - self.head_length]
+            self.head.append(line)
+            self.head_length += len(line)
+            return
+        if len(line) > self.tail_size:
+            self.omitted += len(line) - self.tail_size
+            line = line[-self.tail_size:]
+        self.tail.append(line)
+        self.tail_length += len(line)
+        while self.tail_length > self.tail_size:
+            removed = self.tail.popleft()
+            self.tail_length -= len(removed)
+            self.omitted += len(removed)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def getvalue(self):
+        """ Returns the output kept in memory. """
+        if self.omitted == 0:
+            return "".join(self.head) + "".join(self.tail)
+        return "".join(self.head) + "\n[... {} characters omitted{} ...]\n".format(
+            self.omitted, "" if self.path is None else ", see the log file") + "".join(self.tail)
+
+    def write_to(self, file):
+        """ Writes the complete output (if it was streamed to a file) or the part kept in memory to the given file. """
+        if self.path is not None:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                shutil.copyfileobj(f, file)
+        else:
+            file.write(self.getvalue())
+
+    def remove_file(self):
+        if self.path is not None and os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def read_lines(pipe, output_buffer: OutputBuffer, line_filter=None):
+    """ Reads the given pipe line by line until it is closed and appends the lines that pass the filter to the buffer. """
+    for line in pipe:
+        line = line.decode('utf8', errors='replace')
+        if line_filter is None or line_filter(line):
+            output_buffer.append(line)
+    output_buffer.close()
+
 
 class CommandExecution(object):
     """ Represents the execution of a single command line argument. """
@@ -8,67 +129,188 @@ class CommandExecution(object):
         self.timeout = None
         self.return_code = None
         self.output = None
+        self.messages = None
+        self.stdout = None
+        self.stderr = None
         self.wall_time = None
+        self.resource_usage = None
+        self.memout = None
         self.proc = None
+        self.finished = threading.Event()
+
+    def _signal_group(self, sig):
+        """ Sends the signal to the process group of the command. Returns False if the group does not exist (anymore). """
+        try:
+            os.killpg(self.proc.pid, sig)
+            return True
+        except (ProcessLookupError, PermissionError):
+            return False
+
+    def terminate(self, grace_period=None):
+        """
+        Terminates all processes of the command (including children that are started by it) via SIGTERM and,
+        if they are still alive after the grace period (default: TERMINATION_GRACE_PERIOD seconds), via SIGKILL.
+        """
+        if grace_period is None:
+            grace_period = TERMINATION_GRACE_PERIOD
+        if not self._signal_group(signal.SIGTERM):
+            return
+        deadline = time.monotonic() + grace_period
+        while time.monotonic() < deadline:
+            if self.finished.wait(0.05) and not self._signal_group(0):
+                # the process was reaped and no other process is left in the group
+                return
+        self._signal_group(signal.SIGKILL)
 
     def stop(self):
         self.timeout = True
-        self.proc.kill()
+        self.terminate()
 
-    def run(self, command_line_str, time_limit):
+    def run(self, command_line_str, time_limit, cpus=None, memory_limit : MemoryLimit = None, output_path=None,
+            line_filter=filter_json_export_warnings):
+        """
+        Runs the command in its own session (and thus process group), so that processes started by the command
+        can be terminated as well. The wall time is measured with a monotonic clock.
+        If cpus is given, the process is pinned to these cores.
+        If a memory limit is given, it is enforced for the whole process tree.
+        If output_path is given, the output to stdout and stderr is streamed to output_path + '.stdout' and '.stderr'.
+        Only the beginning and the end of the output is kept in memory (self.output).
+        Lines of stdout are only kept if they pass the given line filter.
+        """
         command_line_list = command_line_str.split()
         command_line_list[0] = os.path.expanduser(command_line_list[0])
-        start_time = time.time()
+
         self.timeout = False
+        self.memout = None
         self.output = ""
+        self.messages = ""
+        self.stdout = OutputBuffer(None if output_path is None else output_path + ".stdout")
+        self.stderr = OutputBuffer(None if output_path is None else output_path + ".stderr")
         try:
-            self.proc = subprocess.Popen(command_line_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if memory_limit is not None:
+                memory_limit.setup()
+                command_line_list = memory_limit.wrap(command_line_list)
+            # The affinity is not set via preexec_fn, since running Python code between fork and exec is unsafe in a
+            # multithreaded process. Instead, the calling thread is pinned while it starts the process (on Linux, the
+            # affinity is a per-thread property that the started process inherits).
+            previous_cpus = None
+            if cpus is not None:
+                previous_cpus = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, cpus)
+            try:
+                # the process starts with the peak RSS of the harness (see get_resource_usage)
+                peak_rss_baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                start_time = time.monotonic()
+                self.proc = subprocess.Popen(command_line_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                             start_new_session=True)
+            finally:
+                if previous_cpus is not None:
+                    os.sched_setaffinity(0, previous_cpus)
         except Exception as e:
-            self.output = "Error when executing the command:\n{}\n".format(e)
+            self.messages = "Error when executing the command:\n{}\n".format(e)
+            self.output = self.messages
+            self.stdout.close()
+            self.stderr.close()
             self.wall_time = 0
             self.return_code = -1
+            if memory_limit is not None:
+                memory_limit.cleanup()
             return
+        with _running_lock:
+            _running.add(self)
+        timer = None
         if time_limit is not None and time_limit > 0:
             timer = threading.Timer(time_limit, self.stop)
             timer.start()
+        # stream both pipes in the background so that we can reap the process ourselves (communicate() would discard its rusage)
+        readers = [threading.Thread(target=read_lines, args=(self.proc.stdout, self.stdout, line_filter)),
+                   threading.Thread(target=read_lines, args=(self.proc.stderr, self.stderr))]
+        for reader in readers:
+            reader.start()
         try:
-            stdout, stderr = self.proc.communicate()
+            pid, status, rusage = os.wait4(self.proc.pid, 0)
+            if timer is not None:
+                timer.cancel()
+            self.wall_time = time.monotonic() - start_time
+            self.proc.returncode = os.waitstatus_to_exitcode(status)
+            self.resource_usage = get_resource_usage(rusage, peak_rss_baseline)
         except Exception as e:
-            self.output = self.output + "Error when executing the command:\n{}\n".format(e)
+            self.messages = self.messages + "Error when executing the command:\n{}\n".format(e)
+            self.proc.wait()
+            self.wall_time = time.monotonic() - start_time
+        except KeyboardInterrupt:
+            self.terminate(0)
+            raise
         finally:
-            timer.cancel()
-            self.wall_time = time.time() - start_time
+            if timer is not None:
+                timer.cancel()
             self.return_code = self.proc.returncode
-        #  filter for uneccesary warning
-        stdout_filtered = ""
-        for line in stdout.decode('utf8').splitlines(keepends=True):
-            if not "WARN (json.hpp:185): Inaccurate JSON export:" in line:
-                stdout_filtered += line
-
-        self.output = self.output + stdout_filtered
+            self.finished.set()
+            with _running_lock:
+                _running.discard(self)
+        # processes that outlived the command (e.g. started in the background) must not steal cpu time from the next invocation
+        self.terminate()
+        for reader in readers:
+            reader.join()
+        self.proc.stdout.close()
+        self.proc.stderr.close()
 
-        if len(stderr) > 0:
-            self.output = self.output + "\n" + "#" * 30 + "Output to stderr" + "#" * 30 + "\n" + stderr.decode('utf8')
+        self.output = self.messages + self.stdout.getvalue()
+        if self.stderr.length > 0:
+            self.output = self.output + STDERR_SEPARATOR + self.stderr.getvalue()
+        if memory_limit is not None:
+            try:
+                self.memout = memory_limit.is_memout(self.return_code, self.output)
+                cgroup_peak = memory_limit.get_peak()
+                if cgroup_peak is not None and self.resource_usage is not None:
+                    self.resource_usage["cgroup-peak-memory"] = cgroup_peak
+            finally:
+                memory_limit.cleanup()
         if self.timeout and self.wall_time <= time_limit:
             print(
                 "WARN: A timeout was triggered although the measured time is {} seconds which is still below the time limit of {} seconds".format(
                     self.wall_time, time_limit))
 
+    def write_output(self, file):
+        """ Writes the complete output (in the same format as self.output) to the given file. """
+        file.write(self.messages)
+        self.stdout.write_to(file)
+        if self.stderr.length > 0:
+            file.write(STDERR_SEPARATOR)
+            self.stderr.write_to(file)
+
+    def remove_output_files(self):
+        self.stdout.remove_file()
+        self.stderr.remove_file()
 
-def execute_command_line(command_line_str: str, time_limit: int, warm_up_run=False):
+
+def run_command_line(command_line_str: str, time_limit: int, warm_up_run=False, cpus=None, memory_limit=None, output_path=None):
     """
     Executes the given command line with the given time limit (in seconds).
     If warm_up_run is true, there will be a warm-up execution with a 5 second time limit (whose results will be discarded) before the actual execution.
-    :returns the output of the command (including the output to stderr, if present), the runtime of the command and either the return code or None (in case of a timeout)
+    If cpus is given, the command is pinned to these cores. If memory_limit is given, it is enforced for the command.
+    If output_path is given, the output of the actual run is streamed to files starting with output_path.
+    :returns the CommandExecution of the actual run
     """
     command_line_str = set_artifact_dir(command_line_str)
     if warm_up_run:
         # do a warm-up run first to hopefully decrease file i/o delay
         dryrun = CommandExecution()
-        dryrun.run(command_line_str, 5)
+        dryrun.run(command_line_str, 5, cpus, memory_limit)
     # now start the actual run.
     execution = CommandExecution()
-    execution.run(command_line_str, time_limit)
+    execution.run(command_line_str, time_limit, cpus, memory_limit, output_path)
+    return execution
+
+
+def execute_command_line(command_line_str: str, time_limit: int, warm_up_run=False, cpus=None):
+    """
+    Executes the given command line with the given time limit (in seconds).
+    If warm_up_run is true, there will be a warm-up execution with a 5 second time limit (whose results will be discarded) before the actual execution.
+    If cpus is given, the command is pinned to these cores.
+    :returns the output of the command (including the output to stderr, if present), the runtime of the command and either the return code or None (in case of a timeout)
+    """
+    execution = run_command_line(command_line_str, time_limit, warm_up_run, cpus)
     if execution.timeout:
         return execution.output, execution.wall_time, None
     else:
@@ -76,50 +318,109 @@ def execute_command_line(command_line_str: str, time_limit: int, warm_up_run=Fal
 
 
 class Execution(object):
+    LOG_SEPARATOR = "\n" + "#" * 40 + "\n"
+
     def __init__(self, invocation):
         self.invocation = invocation
         self.wall_time = None
         self.logs = None
+        self.command_executions = None
         self.timeout = None
         self.error = None
         self.return_codes = None
+        self.resource_usage = None
+        self.memout = None
+        self._concatenated_logs = None
 
-    def run(self, warm_up_run=False):
+    def run(self, warm_up_run=False, cpus=None, memory_limit_method=None, output_path=None):
+        """
+        Runs the command of the invocation.
+        If memory_limit_method is given and the invocation declares a memory limit, the limit is enforced using this method.
+        If output_path is given, the output of the tool is streamed to files starting with output_path
+        (see write_log and remove_output_files), otherwise only its beginning and end are kept.
+        """
         self.error = False
         self.timeout = False
         self.wall_time = 0.0
-        self.logs = []
+        self.logs = []  # each log consists of a header, the output of the command and a footer
+        self.command_executions = []
         self.return_codes = []
+        self.resource_usage = None
+        self.memout = None
+        self._concatenated_logs = None
+
+        memory_limit = None
+        if memory_limit_method is not None and self.invocation.memory_limit is not None:
+            memory_limit = MemoryLimit(self.invocation.memory_limit, memory_limit_method)
 
         command = self.invocation.command
-        log, wall_time, return_code = execute_command_line(command, self.invocation.time_limit - self.wall_time, warm_up_run)
+        command_execution = run_command_line(command, self.invocation.time_limit - self.wall_time, warm_up_run, cpus,
+                                             memory_limit, output_path)
+        wall_time = command_execution.wall_time
+        return_code = None if command_execution.timeout else command_execution.return_code
         self.wall_time = self.wall_time + wall_time
-        self.logs.append(
-            "Command:\t{}\nWallclock time:\t{}\nReturn code:\t{}\nOutput:\n{}\n".format(command, wall_time,
-                                                                                        return_code, log))
+        self.resource_usage = command_execution.resource_usage
+        self.command_executions.append(command_execution)
+        resource_usage_str = ""
+        if self.resource_usage is not None:
+            resource_usage_str = "CPU time:\t{}s user, {}s system\nPeak RSS:\t{} MiB\n".format(
+                self.resource_usage["user-time"], self.resource_usage["system-time"], self.resource_usage["peak-rss"])
+        header = "Command:\t{}\nWallclock time:\t{}\n{}Return code:\t{}\nOutput:\n".format(command, wall_time,
+                                                                                         resource_usage_str, return_code)
+        footer = "\n"
+        if memory_limit is not None:
+            self.memout = False
         if return_code is None:
             self.timeout = True
             self.error = False
-            self.logs[-1] = self.logs[
-                                -1] + "\n" + "-" * 10 + "\nComputation aborted after {} seconds since the total time limit of {} seconds was exceeded.\n".format(
+            footer = footer + "\n" + "-" * 10 + "\nComputation aborted after {} seconds since the total time limit of {} seconds was exceeded.\n".format(
                 self.wall_time, self.invocation.time_limit)
             self.return_codes.append(-9)  # process got killed due to timeout
+        elif command_execution.memout:
+            self.memout = True
+            self.error = True
+            footer = footer + "\n" + "-" * 10 + "\nComputation aborted since the memory limit of {} MiB ({}) was exceeded.\n".format(
+                memory_limit.limit, memory_limit.method)
+            self.return_codes.append(return_code)
         else:
             self.error = self.error or return_code != 0
             self.return_codes.append(return_code)
+        self.logs.append((header, footer))
 
     def concatenate_logs(self):
-        hline = "\n" + "#" * 40 + "\n"
-        return hline.join(self.logs)
+        """ Returns the logs of all commands. The output of the tool is possibly shortened (see OutputBuffer). """
+        if self._concatenated_logs is None:
+            self._concatenated_logs = Execution.LOG_SEPARATOR.join(
+                [header + command_execution.output + footer
+                 for (header, footer), command_execution in zip(self.logs, self.command_executions)])
+        return self._concatenated_logs
+
+    def write_log(self, file):
+        """ Writes the complete logs of all commands to the given file without loading the output into memory. """
+        for i, ((header, footer), command_execution) in enumerate(zip(self.logs, self.command_executions)):
+            if i > 0:
+                file.write(Execution.LOG_SEPARATOR)
+            file.write(header)
+            command_execution.write_output(file)
+            file.write(footer)
+
+    def remove_output_files(self):
+        for command_execution in self.command_executions:
+            command_execution.remove_output_files()
 
     def to_json(self):
         res = self.invocation.to_json()
         if self.wall_time is not None:
             res["wallclock-time"] = str(self.wall_time)
+        if self.resource_usage is not None:
+            for key, value in self.resource_usage.items():
+                res[key] = str(value) if isinstance(value, float) else value
         if self.timeout is not None:
             res["timeout"] = self.timeout
         if self.error is not None:
             res["execution-error"] = self.error
+        if self.memout is not None:
+            res["memout"] = self.memout
         if self.return_codes is not None:
             res["return-codes"] = self.return_codes
         return res
@@ -57,6 +57,9 @@ def is_not_supported(result_json):
 
 # Reads an execution result in json format and detects if it indicates a memory error
 def is_memout(result_json):
+    if "memout" in result_json:
+        # a memory limit was enforced during the execution, so we know for sure
+        return result_json["memout"]
     if "execution-error" not in result_json or result_json["execution-error"] == False:
         return False
     path = set_artifact_dir(result_json["log"])
@@ -343,8 +346,8 @@ def create_log_page(settings, result_json, output_dir, overwrite_logs):
         indention += 1
         if result_json["timeout"]:
             write_line(f, indention,
-                       '<tr><td>Walltime (MC-Time):</td><td style="color: red;">&gt {}s (NA) (Timeout)</td></tr>'.format(
-                           result_json["time-limit"]))
+                       '<tr><td>Walltime (MC-Time):</td><td style="color: red;">&gt {}s (NA) ({})</td></tr>'.format(
+                           result_json["time-limit"], "Timeout, pruned" if result_json.get("pruned", False) else "Timeout"))
         else:
             if "mc-time" in result_json:
                 write_line(f, indention, '<tr><td>Walltime (MC-Time):</td><td style="tt">{}s ({}s)</td></tr>'.format(
@@ -353,6 +356,17 @@ def create_log_page(settings, result_json, output_dir, overwrite_logs):
                 write_line(f, indention, '<tr><td>Walltime (MC-Time):</td><td style="tt">{}s (NA)</td></tr>'.format(
                     result_json["wallclock-time"]))
 
+            if "peak-rss" in result_json:
+                write_line(f, indention, '<tr><td>Peak RSS (CPU time):</td><td style="tt">{:.1f} MiB ({}s user, {}s system)</td></tr>'.format(
+                    float(result_json["peak-rss"]), result_json["user-time"], result_json["system-time"]))
+                if "peak-rss-baseline" in result_json:
+                    # the peak RSS includes the RSS of the harness when the tool was started
+                    write_line(f, indention, '<tr><td>Peak RSS floor (harness):</td><td style="tt">{:.1f} MiB</td></tr>'.format(
+                        float(result_json["peak-rss-baseline"])))
+            if "cgroup-peak-memory" in result_json:
+                write_line(f, indention, '<tr><td>Peak memory (cgroup):</td><td style="tt">{:.1f} MiB</td></tr>'.format(
+                    float(result_json["cgroup-peak-memory"])))
+
             return_codes = []
             if "return-codes" in result_json:
                 return_codes = result_json["return-codes"]
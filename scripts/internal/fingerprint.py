@@ -0,0 +1,70 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id, get_benchmark_catalog
+import hashlib, threading
+
+_digest_lock = threading.Lock()
+_digests = dict()  # (path, size, mtime) -> digest
+
+
+def file_digest(path: str):
+    """
+    Returns the sha256 digest of the contents of the given file or None if it does not exist.
+    Digests are memoized as long as size and modification time of the file do not change.
+    """
+    path = os.path.realpath(set_artifact_dir(path))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if key in _digests:
+            return _digests[key]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    with _digest_lock:
+        _digests[key] = sha.hexdigest()
+    return _digests[key]
+
+
+def get_tool_files(command: str):
+    """
+    Returns the files of the tool that is invoked by the given command, i.e., the executable and,
+    for containerized tools (e.g. 'apptainer run image.sif ...'), the container image.
+    """
+    tokens = set_artifact_dir(command).split()
+    if len(tokens) == 0:
+        return []
+    executable = os.path.expanduser(tokens[0])
+    if not os.path.isfile(executable):
+        executable = shutil.which(executable) or executable
+    result = [executable]
+    for token in tokens[1:]:
+        if token.endswith(".sif"):
+            result.append(token)
+    return result
+
+
+def get_model_files(settings, benchmark_id):
+    """ Returns the files of the given benchmark. """
+    benchmark = get_benchmark_from_id(settings, benchmark_id)
+    return [os.path.join(benchmark.get_directory(), f) for f in benchmark.get_all_filenames()]
+
+
+def invocation_fingerprint(settings, invocation):
+    """
+    Returns a fingerprint of the given invocation that changes whenever its command,
+    the tool binary (or container image) or the model files change.
+    """
+    sha = hashlib.sha256()
+    # we hash the command without resolving $ARTIFACT_DIR, so moving the artifact does not change fingerprints
+    sha.update(invocation.command.encode("utf-8"))
+    for filename in get_tool_files(invocation.command):
+        sha.update(b"\0" + str(file_digest(filename)).encode("utf-8"))
+    for filename in get_model_files(settings, invocation.benchmark_id):
+        # the digests of the model files are usually known from the compiled benchmark catalog
+        digest = get_benchmark_catalog(settings).get_file_digest(filename)
+        sha.update(b"\0" + str(digest if digest is not None else file_digest(filename)).encode("utf-8"))
+    return sha.hexdigest()
@@ -15,8 +15,11 @@ class Invocation(object):
         self.solver_id = ""
         self.time_limit = None
         self.export = None
+        self.memory_limit = None # in MiB, optional
 
         self.export_value_file = None # not saved
+        self.prebuilt_model = None # path and build time of the prebuilt model (see ModelCache), not saved
+        self.memory_limit_method = None # method for enforcing the memory limit of an invocation from the work queue, not saved
 
         if invocation_json is not None:
             self.benchmark_id = invocation_json["benchmark-id"]
@@ -27,6 +30,8 @@ class Invocation(object):
             self.note = invocation_json["invocation-note"]
             self.time_limit = float(invocation_json["time-limit"])
             self.precision = invocation_json["precision"]
+            if "memory-limit" in invocation_json and invocation_json["memory-limit"] is not None:
+                self.memory_limit = float(invocation_json["memory-limit"])
 
             self.command = invocation_json["command"]
             if self.command == "":
@@ -45,19 +50,22 @@ class Invocation(object):
         self.command = command
 
     def to_json(self):
-        return OrderedDict([("benchmark-id", self.benchmark_id),
-                            ("tool", self.tool),
-                            ("configuration-id", self.configuration_id),
-                            ("solver-id", self.solver_id),
-                            ("export", self.export),
-                            ("invocation-note", self.note),
-                            ("command", self.command),
-                            ("time-limit", self.time_limit),
-                            ("precision", "ignored" if self.precision == "ignored" else float(self.precision))])
-
-    def execute(self):
+        res = OrderedDict([("benchmark-id", self.benchmark_id),
+                           ("tool", self.tool),
+                           ("configuration-id", self.configuration_id),
+                           ("solver-id", self.solver_id),
+                           ("export", self.export),
+                           ("invocation-note", self.note),
+                           ("command", self.command),
+                           ("time-limit", self.time_limit),
+                           ("precision", "ignored" if self.precision == "ignored" else float(self.precision))])
+        if self.memory_limit is not None:
+            res["memory-limit"] = self.memory_limit
+        return res
+
+    def execute(self, cpus=None, memory_limit_method=None, output_path=None, warm_up_run=True):
         execution = Execution(self)
-        execution.run(True) # with warm-up run!
+        execution.run(warm_up_run, cpus, memory_limit_method, output_path)
         return execution
 
 
@@ -0,0 +1,135 @@
+from .utility import *
+from .invocation import Invocation
+from .sharding import get_invocation_cost, partition
+import struct
+
+INDEX_MAGIC = b"INVIDX01"
+INDEX_HEADER = struct.Struct("<8sQqQ")  # magic, size and modification time of the invocation store, number of entries
+INDEX_ENTRY = struct.Struct("<Qd")  # offset of the line, estimated cost (see get_invocation_cost)
+
+
+def is_invocation_store(path: str):
+    """ Returns true if the given invocations file is an invocation store (.jsonl) rather than a json array. """
+    return path.endswith(".jsonl")
+
+
+def get_index_path(path: str):
+    return path + ".idx"
+
+
+def load_invocations_json(path: str):
+    """ Returns the list of invocation jsons of the given invocations file (json array or invocation store). """
+    if not is_invocation_store(path):
+        return load_json(path)
+    result = []
+    with open(set_artifact_dir(path), 'r', encoding="utf-8") as store_file:
+        for line in store_file:
+            if line.strip() != "":
+                result.append(json.loads(line, object_pairs_hook=OrderedDict))
+    return result
+
+
+def save_invocation_store(settings, invocations_json, path: str):
+    """
+    Writes the given invocation jsons (e.g. a generator) to an invocation store, one json object per line,
+    and creates its index. Returns the number of invocations.
+    """
+    entries = []
+    num_states_cache = dict()
+    with open_atomic(path, binary=True) as store_file:
+        offset = 0
+        for invocation_json in invocations_json:
+            line = (json.dumps(invocation_json, ensure_ascii=False) + "\n").encode("utf-8")
+            entries.append((offset, get_invocation_cost(settings, Invocation(invocation_json), num_states_cache)))
+            store_file.write(line)
+            offset += len(line)
+    _write_index(path, entries)
+    return len(entries)
+
+
+def _write_index(path, entries):
+    stat = os.stat(set_artifact_dir(path))
+    with open_atomic(get_index_path(path), binary=True) as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(entries)))
+        for offset, cost in entries:
+            index_file.write(INDEX_ENTRY.pack(offset, cost))
+
+
+def build_index(settings, path: str):
+    """ (Re-)creates the index of the given invocation store. Returns the number of invocations. """
+    entries = []
+    num_states_cache = dict()
+    with open(set_artifact_dir(path), 'rb') as store_file:
+        offset = 0
+        for line in store_file:
+            if line.strip() != b"":
+                entries.append((offset, get_invocation_cost(settings, Invocation(json.loads(line)), num_states_cache)))
+            offset += len(line)
+    _write_index(path, entries)
+    return len(entries)
+
+
+class InvocationStore(object):
+    """
+    Invocations file with one invocation json per line (.jsonl) and a binary index ('<file>.idx') that contains the offset
+    of each line and the estimated cost of each invocation. Hence, single invocations (-i) and the invocations of a shard
+    (--shard) are read without parsing the whole file. If the store was changed after the index was created, the index
+    is created again.
+    """
+
+    def __init__(self, settings, path: str):
+        self.settings = settings
+        self.path = set_artifact_dir(path)
+        if not self._is_index_valid():
+            print("Creating index of invocation store '{}'.".format(path))
+            build_index(settings, path)
+        with open(get_index_path(self.path), 'rb') as index_file:
+            magic, size, mtime, self.num_entries = INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+
+    def _is_index_valid(self):
+        try:
+            with open(get_index_path(self.path), 'rb') as index_file:
+                magic, size, mtime, num_entries = INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+            stat = os.stat(self.path)
+        except (OSError, struct.error):
+            return False
+        return magic == INDEX_MAGIC and size == stat.st_size and mtime == stat.st_mtime_ns
+
+    def __len__(self):
+        return self.num_entries
+
+    def _read_entries(self, indices):
+        """ Returns the pairs (offset, cost) of the entries with the given indices. """
+        result = []
+        with open(get_index_path(self.path), 'rb') as index_file:
+            for index in indices:
+                index_file.seek(INDEX_HEADER.size + index * INDEX_ENTRY.size)
+                result.append(INDEX_ENTRY.unpack(index_file.read(INDEX_ENTRY.size)))
+        return result
+
+    def get_costs(self):
+        """ Returns the estimated costs of all invocations (see get_invocation_cost). """
+        with open(get_index_path(self.path), 'rb') as index_file:
+            index_file.seek(INDEX_HEADER.size)
+            data = index_file.read(self.num_entries * INDEX_ENTRY.size)
+        return [cost for offset, cost in INDEX_ENTRY.iter_unpack(data)]
+
+    def get(self, indices):
+        """ Returns the invocations with the given indices (0 based). """
+        for index in indices:
+            if index not in range(0, self.num_entries):
+                raise AssertionError("Index '{}' is out of range: it has to be at least 0 and less than {}".format(
+                    index, self.num_entries))
+        result = []
+        with open(self.path, 'rb') as store_file:
+            for offset, cost in self._read_entries(indices):
+                store_file.seek(offset)
+                result.append(Invocation(json.loads(store_file.readline(), object_pairs_hook=OrderedDict)))
+        return result
+
+    def get_all(self):
+        return [Invocation(invocation_json) for invocation_json in load_invocations_json(self.path)]
+
+    def select_shard(self, k, num_shards):
+        """ Returns the invocations of shard k (1-based) of num_shards, balanced by the costs in the index. """
+        return self.get(partition(self.get_costs(), num_shards)[k - 1])
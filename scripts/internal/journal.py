@@ -0,0 +1,149 @@
+from .utility import *
+from .fingerprint import invocation_fingerprint
+from .invocation import Invocation
+import threading
+
+
+def load_results(settings):
+    """
+    Returns the result jsons in the logs directory (skipping files that are no valid results).
+    Used by the runtime prediction, the memory estimation and the pruning, which should share a single scan of the logs.
+    """
+    results = []
+    logdir = set_artifact_dir(settings.results_dir_logs())
+    if not os.path.isdir(logdir):
+        return results
+    for filename in sorted(os.listdir(logdir)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            result_json = load_json(os.path.join(logdir, filename))
+            Invocation(result_json)
+        except Exception:
+            continue
+        results.append(result_json)
+    return results
+
+
+def get_result_status(result_json):
+    """ Classifies a result json as 'pruned', 'timeout', 'memout', 'error' or 'ok'. """
+    if result_json.get("pruned", False):
+        # not executed (see Pruning), the result is only an estimate
+        return "pruned"
+    if result_json.get("timeout", False):
+        return "timeout"
+    if result_json.get("memout", False):
+        return "memout"
+    if result_json.get("execution-error", False):
+        return "error"
+    return "ok"
+
+
+class Journal(object):
+    """
+    Append-only journal (one json object per line) of the invocations executed for a results directory.
+    Each entry records the identifier and the fingerprint of an invocation together with the status of its result.
+    When restarting, invocations whose result is complete and whose fingerprint did not change are skipped.
+    Invocations that are missing, whose execution failed or whose fingerprint changed (stale) are executed again.
+    Timeouts and memouts are only final as long as the time and memory limit, respectively, are not increased.
+    """
+    # results with these statuses are kept, everything else (e.g. a tool killed by the OOM killer of SLURM) is retried.
+    # Pruned invocations are retried as well, with pruning enabled they are pruned again if the cause still applies.
+    FINAL_STATUSES = ["ok", "timeout", "memout"]
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.path = set_artifact_dir(os.path.join(settings.results_dir(), "journal.jsonl"))
+        self.lock = threading.Lock()
+        self.entries = dict()  # identifier -> last journal entry
+        self.fingerprints = dict()  # identifier -> fingerprint of the invocation in this run
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, 'r', encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line might be incomplete if the job got killed while writing it
+                    continue
+                self.entries[entry["identifier"]] = entry
+
+    def is_result_complete(self, identifier):
+        """
+        Returns true if the result json and the log file of the given invocation exist and are readable.
+        Pruned results are never complete (also those of journals in which they were recorded as timeouts).
+        """
+        json_path = os.path.join(self.settings.results_dir_logs(), identifier + ".json")
+        if not os.path.isfile(set_artifact_dir(json_path)):
+            return False
+        try:
+            result_json = load_json(json_path)
+        except Exception:
+            return False
+        if "wallclock-time" not in result_json or "log" not in result_json or result_json.get("pruned", False):
+            return False
+        return os.path.isfile(set_artifact_dir(os.path.join(self.settings.results_dir_logs(), result_json["log"])))
+
+    def fingerprint(self, invocation):
+        identifier = invocation.get_identifier()
+        if identifier not in self.fingerprints:
+            self.fingerprints[identifier] = invocation_fingerprint(self.settings, invocation)
+        return self.fingerprints[identifier]
+
+    def is_done(self, invocation):
+        """ Returns true if the invocation does not need to be executed again. """
+        identifier = invocation.get_identifier()
+        if identifier not in self.entries:
+            return False
+        entry = self.entries[identifier]
+        return entry["status"] in Journal.FINAL_STATUSES and entry["fingerprint"] == self.fingerprint(invocation) \
+            and self.is_result_complete(identifier) and self._is_limit_sufficient(invocation, entry)
+
+    @staticmethod
+    def _exceeds(limit, other_limit):
+        """ Returns true if the limit (None if unlimited) is larger than the other limit. """
+        if limit is None:
+            return other_limit is not None
+        return other_limit is not None and float(limit) > float(other_limit)
+
+    def _is_limit_sufficient(self, invocation, entry):
+        """ Returns false if the invocation ran into a timeout (memout) but the time (memory) limit has been increased since then. """
+        if entry["status"] not in ["timeout", "memout"]:
+            return True
+        if "time-limit" not in entry:
+            # entries of older journals do not contain the limits, but the result does
+            result_json = load_json(os.path.join(self.settings.results_dir_logs(), entry["identifier"] + ".json"))
+            entry = OrderedDict(entry)
+            entry["time-limit"] = result_json.get("time-limit")
+            entry["memory-limit"] = result_json.get("memory-limit")
+        if entry["status"] == "timeout":
+            return not Journal._exceeds(invocation.time_limit, entry["time-limit"])
+        return not Journal._exceeds(invocation.memory_limit, entry["memory-limit"])
+
+    def filter(self, invocations):
+        """ Returns the invocations that need to be executed and prints a summary of the skipped ones. """
+        pending = [invocation for invocation in invocations if not self.is_done(invocation)]
+        if len(pending) < len(invocations):
+            print("Skipping {} of {} invocations with complete results from a previous run (see {}).".format(
+                len(invocations) - len(pending), len(invocations), self.path))
+        return pending
+
+    def record(self, invocation, result_json):
+        """ Appends an entry for the given (executed) invocation. Safe to call from parallel workers. """
+        entry = OrderedDict([("identifier", invocation.get_identifier()),
+                             ("fingerprint", self.fingerprint(invocation)),
+                             ("status", get_result_status(result_json)),
+                             ("wallclock-time", result_json.get("wallclock-time")),
+                             ("time-limit", invocation.time_limit),
+                             ("memory-limit", invocation.memory_limit),
+                             ("finished", time.strftime("%Y-%m-%dT%H:%M:%S"))])
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding="utf-8") as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self.entries[entry["identifier"]] = entry
@@ -0,0 +1,172 @@
+from .utility import *
+import threading, uuid
+
+CGROUP_MOUNT = "/sys/fs/cgroup"
+
+# Messages that tools print when an allocation fails. Only used for limits enforced via rlimit,
+# where the tool is not killed but sees failing allocations.
+ALLOCATION_FAILURE_MESSAGES = ["std::bad_alloc", "java.lang.OutOfMemoryError", "Cannot allocate memory",
+                               "Maximum memory exceeded.", "MemoryError"]
+
+
+def _read_file(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def _write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class CgroupHierarchy(object):
+    """
+    Manages the cgroup v2 sub-groups that are used to enforce memory limits.
+    A process can not be in a cgroup whose children have controllers enabled. Hence, the harness itself is moved to
+    the sub-group 'harness' of its own cgroup and each limited execution gets a sibling sub-group.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.base = None
+        self.initialized = False
+        self.error = None
+
+    def _init(self):
+        if not os.path.isfile(os.path.join(CGROUP_MOUNT, "cgroup.controllers")):
+            raise AssertionError("No cgroup v2 hierarchy mounted at {}.".format(CGROUP_MOUNT))
+        own_cgroup = None
+        for line in _read_file("/proc/self/cgroup").splitlines():
+            if line.startswith("0::"):
+                own_cgroup = line[len("0::"):]
+        if own_cgroup is None:
+            raise AssertionError("Unable to determine the cgroup of this process.")
+        base = os.path.join(CGROUP_MOUNT, own_cgroup.lstrip("/"))
+        if "memory" not in _read_file(os.path.join(base, "cgroup.controllers")).split():
+            raise AssertionError("The memory controller is not available in cgroup {}.".format(base))
+        for filename in ["cgroup.subtree_control", "cgroup.procs"]:
+            if not os.access(os.path.join(base, filename), os.W_OK):
+                raise AssertionError("Missing permission to write '{}' in cgroup {}.".format(filename, base))
+        if "memory" in _read_file(os.path.join(base, "cgroup.subtree_control")).split():
+            # e.g. set up by a previous instance of the harness in the same cgroup
+            self.base = base
+            return
+        harness = os.path.join(base, "harness")
+        created = not os.path.isdir(harness)
+        if created:
+            os.mkdir(harness)
+        _write_file(os.path.join(harness, "cgroup.procs"), str(os.getpid()))
+        try:
+            _write_file(os.path.join(base, "cgroup.subtree_control"), "+memory")
+        except OSError:
+            # e.g. other processes in our cgroup: move the harness back so that it is left unchanged
+            _write_file(os.path.join(base, "cgroup.procs"), str(os.getpid()))
+            if created:
+                os.rmdir(harness)
+            raise
+        self.base = base
+
+    def get_base(self):
+        """ Returns the directory in which sub-groups are created. Raises an error if cgroups can not be used. """
+        with self.lock:
+            if not self.initialized:
+                self.initialized = True
+                try:
+                    self._init()
+                except Exception as e:
+                    self.error = e
+            if self.error is not None:
+                raise self.error
+            return self.base
+
+    def is_available(self):
+        try:
+            self.get_base()
+            return True
+        except Exception:
+            return False
+
+
+cgroups = CgroupHierarchy()
+
+
+class MemoryLimit(object):
+    """
+    A hard memory limit (in MiB) for a single command execution. The limit is enforced via
+        * 'cgroup': a cgroup v2 sub-group with the given memory.max (and no swap) that contains the whole process tree.
+                    If the limit is exceeded, the kernel kills the processes and the oom_kill event is recorded.
+        * 'rlimit': RLIMIT_AS of the started process (inherited by its children). Allocations beyond the limit fail.
+        * 'auto':   cgroup if available and rlimit otherwise.
+    In both cases, the command is started via a shell that joins the cgroup or sets the limit and then executes the
+    command (see wrap), so the limit applies before the command starts and no Python code runs in the forked process.
+    """
+
+    def __init__(self, limit, method="auto"):
+        if method not in ["auto", "cgroup", "rlimit"]:
+            raise AssertionError("Unknown method '{}' for enforcing memory limits.".format(method))
+        if method == "auto":
+            method = "cgroup" if cgroups.is_available() else "rlimit"
+        self.limit = float(limit)
+        self.method = method
+        self.cgroup = None
+
+    def get_limit_bytes(self):
+        return int(self.limit * 1024 * 1024)
+
+    def setup(self):
+        """ Called by the harness before the process is started. """
+        if self.method == "cgroup":
+            self.cgroup = os.path.join(cgroups.get_base(), "invocation-" + uuid.uuid4().hex)
+            os.mkdir(self.cgroup)
+            _write_file(os.path.join(self.cgroup, "memory.max"), str(self.get_limit_bytes()))
+            if os.path.isfile(os.path.join(self.cgroup, "memory.swap.max")):
+                _write_file(os.path.join(self.cgroup, "memory.swap.max"), "0")
+            # kill the whole process tree if the limit is exceeded
+            _write_file(os.path.join(self.cgroup, "memory.oom.group"), "1")
+
+    def wrap(self, command_line_list):
+        """ Returns the command line (as list) that enforces the limit for the given command. Call after setup(). """
+        if self.method == "cgroup":
+            # $$ is the pid of the shell, which is replaced by the command
+            return ["/bin/sh", "-c", 'echo $$ > "$0" && exec "$@"', os.path.join(self.cgroup, "cgroup.procs")] + command_line_list
+        # ulimit -v sets the soft and the hard limit of RLIMIT_AS (in KiB)
+        return ["/bin/sh", "-c", 'ulimit -v "$0" && exec "$@"', str(self.get_limit_bytes() // 1024)] + command_line_list
+
+    def is_memout(self, return_code, output):
+        """ Returns true if the execution was terminated due to exceeding the limit. Call before cleanup(). """
+        if self.method == "cgroup":
+            for line in _read_file(os.path.join(self.cgroup, "memory.events")).splitlines():
+                key, value = line.split()
+                if key == "oom_kill" and int(value) > 0:
+                    return True
+            return False
+        if return_code == 0:
+            return False
+        for m in ALLOCATION_FAILURE_MESSAGES:
+            if m in output:
+                return True
+        return False
+
+    def get_peak(self):
+        """ Returns the peak memory (in MiB) of the cgroup or None if unavailable. Call before cleanup(). """
+        if self.cgroup is None or not os.path.isfile(os.path.join(self.cgroup, "memory.peak")):
+            return None
+        return int(_read_file(os.path.join(self.cgroup, "memory.peak"))) / (1024 * 1024)
+
+    def cleanup(self):
+        """ Kills all processes that remain in the cgroup and removes it. """
+        if self.cgroup is None:
+            return
+        try:
+            if os.path.isfile(os.path.join(self.cgroup, "cgroup.kill")):
+                _write_file(os.path.join(self.cgroup, "cgroup.kill"), "1")
+            for attempt in range(50):
+                try:
+                    os.rmdir(self.cgroup)
+                    break
+                except OSError:
+                    # processes are still being killed
+                    time.sleep(0.1)
+        except Exception as e:
+            print("WARN: Unable to remove cgroup '{}': {}".format(self.cgroup, e))
+        self.cgroup = None
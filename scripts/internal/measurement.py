@@ -0,0 +1,98 @@
+from .utility import *
+
+CONFIDENCE = 0.95  # confidence level of the intervals for the median
+
+
+def get_median(samples):
+    return get_quantile(samples, 0.5)
+
+
+def get_quantile(samples, q):
+    """ Returns the q-quantile of the samples (with linear interpolation between the closest ranks). """
+    values = sorted(samples)
+    position = q * (len(values) - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def get_iqr(samples):
+    """ Returns the interquartile range of the samples. """
+    return get_quantile(samples, 0.75) - get_quantile(samples, 0.25)
+
+
+def get_median_confidence_interval(samples, confidence=CONFIDENCE):
+    """
+    Returns a distribution-free confidence interval [x_(k), x_(n-k+1)] for the median of the samples, where x_(i) is the i-th
+    smallest sample and k is the largest index such that the interval covers the median with at least the given confidence.
+    Returns None if there are too few samples (e.g. less than 6 for 95%).
+    """
+    n = len(samples)
+    values = sorted(samples)
+    alpha = 1.0 - confidence
+    # P(x_(k) > median) = P(Bin(n, 1/2) < k)
+    k = 0
+    tail = 0.0
+    while k < n:
+        next_tail = tail + math.comb(n, k) / 2.0 ** n
+        if 2 * next_tail > alpha:
+            break
+        tail = next_tail
+        k += 1
+    if k == 0:
+        return None
+    return values[k - 1], values[n - k]
+
+
+class RepeatedMeasurement(object):
+    """
+    Collects samples of repeated executions of an invocation and decides whether another repetition is necessary.
+    Repetitions stop as soon as one of the following holds:
+        * the confidence interval of the median is at most max_relative_ci_width times the median,
+        * max_repetitions samples have been taken,
+        * another repetition (assumed to take as long as the median) would exceed the time budget (in seconds).
+    Cheap invocations therefore get many samples while expensive ones are only executed once or twice.
+    """
+
+    def __init__(self, max_repetitions=10, time_budget=60.0, max_relative_ci_width=0.05):
+        self.max_repetitions = max_repetitions
+        self.time_budget = time_budget
+        self.max_relative_ci_width = max_relative_ci_width
+        self.samples = OrderedDict()  # key (e.g. 'wallclock-time') -> list of samples
+        self.total_time = 0.0
+        self.repetitions = 0
+
+    def add(self, wall_time, values):
+        """ Adds the samples of one execution that took wall_time seconds. values maps keys to samples (or None). """
+        self.repetitions += 1
+        self.total_time += wall_time
+        for key, value in values.items():
+            if value is not None:
+                self.samples.setdefault(key, []).append(float(value))
+
+    def is_precise(self, key):
+        if key not in self.samples:
+            return False
+        median = get_median(self.samples[key])
+        interval = get_median_confidence_interval(self.samples[key])
+        if interval is None:
+            return False
+        return interval[1] - interval[0] <= self.max_relative_ci_width * median
+
+    def needs_repetition(self):
+        if self.repetitions >= self.max_repetitions or self.repetitions == 0:
+            return False
+        if self.total_time + get_median(self.samples["wallclock-time"]) > self.time_budget:
+            return False
+        return not all(self.is_precise(key) for key in self.samples)
+
+    def to_json(self):
+        """ Returns the samples as well as their median, interquartile range and confidence interval. """
+        res = OrderedDict([("repetitions", self.repetitions)])
+        for key, samples in self.samples.items():
+            interval = get_median_confidence_interval(samples)
+            res[key + "-samples"] = samples
+            res[key + "-median"] = get_median(samples)
+            res[key + "-iqr"] = get_iqr(samples)
+            res[key + "-ci"] = list(interval) if interval is not None else None
+        return res
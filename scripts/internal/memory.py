@@ -0,0 +1,92 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id
+from .invocation import Invocation
+from .journal import load_results
+
+# Rough memory model used if nothing better is known: a fixed base (e.g. the JVM for Prism and SDS) plus a number of bytes per state.
+# The values are deliberately on the conservative side.
+BASE_MEMORY = {"storm": 256, "prism": 1024, "sds": 1024, "greatspn": 256}  # in MiB
+BYTES_PER_STATE = {"storm": 2048, "prism": 1024, "sds": 512, "greatspn": 1024}
+EXACT_BYTES_PER_STATE = 8192  # exact (rational) arithmetic needs considerably more memory
+PEAK_RSS_MARGIN = 1.2  # safety margin for estimates based on a previous execution
+
+
+def get_available_memory():
+    """
+    Returns the memory (in MiB) that is available to this process, i.e.,
+    the limit of the enclosing cgroup (e.g. set by SLURM) or the total memory of the node.
+    """
+    for path in ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]:
+        try:
+            with open(path, 'r') as limit_file:
+                limit = limit_file.read().strip()
+            # cgroup v1 reports a huge number if there is no limit
+            if limit != "max" and int(limit) < 2 ** 60:
+                return int(limit) / (1024 * 1024)
+        except (IOError, ValueError):
+            pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+
+
+def get_peak_memory(res_json):
+    """
+    Returns the peak memory (in MiB) of the tool of the given result or None if it is unknown. The peak memory of the
+    cgroup is preferred, since the peak RSS is never below the RSS of the harness when the tool was started (see
+    get_resource_usage). A peak RSS at that baseline is no estimate of the tool's memory, hence None is returned.
+    """
+    if "cgroup-peak-memory" in res_json:
+        return float(res_json["cgroup-peak-memory"])
+    if "peak-rss" not in res_json:
+        return None
+    if "peak-rss-baseline" in res_json and float(res_json["peak-rss"]) <= float(res_json["peak-rss-baseline"]):
+        return None
+    return float(res_json["peak-rss"])
+
+
+class MemoryEstimator(object):
+    """
+    Estimates how much memory (in MiB) an invocation needs. In descending priority, estimates are taken from
+        * the memory limit declared in the invocation,
+        * the peak memory of a previous execution of the invocation (i.e., result files in the logs directory),
+        * the number of states of the benchmark, either from a previous execution or from the index file of the model,
+        * the given default.
+    """
+
+    def __init__(self, settings, default_estimate=None, results=None):
+        """ The previous results are loaded from the logs directory unless they are given (see load_results). """
+        self.settings = settings
+        self.default_estimate = default_estimate
+        self.states = dict()  # benchmark id -> number of states
+        self.peak_rss = dict()  # invocation identifier -> peak memory of a previous execution
+        self._load_previous_results(results if results is not None else load_results(settings))
+
+    def _load_previous_results(self, results):
+        for res_json in results:
+            if not res_json.get("timeout", False):
+                # the peak memory of a timed out execution is only a lower bound
+                peak = get_peak_memory(res_json)
+                if peak is not None:
+                    self.peak_rss[Invocation(res_json).get_identifier()] = peak
+            if "states" in res_json and is_number(res_json["states"]):
+                benchmark_id = res_json["benchmark-id"]
+                self.states[benchmark_id] = max(self.states.get(benchmark_id, 0), int(res_json["states"]))
+
+    def get_num_states(self, invocation):
+        if invocation.benchmark_id in self.states:
+            return self.states[invocation.benchmark_id]
+        try:
+            return get_benchmark_from_id(self.settings, invocation.benchmark_id).get_num_states()
+        except LookupError:
+            return None
+
+    def estimate(self, invocation):
+        """ Returns the estimated memory consumption of the invocation in MiB or None if there is no estimate. """
+        if invocation.memory_limit is not None:
+            return invocation.memory_limit
+        if invocation.get_identifier() in self.peak_rss:
+            return self.peak_rss[invocation.get_identifier()] * PEAK_RSS_MARGIN
+        num_states = self.get_num_states(invocation)
+        if num_states is not None and invocation.tool in BASE_MEMORY:
+            bytes_per_state = EXACT_BYTES_PER_STATE if "exact" in invocation.solver_id else BYTES_PER_STATE[invocation.tool]
+            return BASE_MEMORY[invocation.tool] + num_states * bytes_per_state / (1024 * 1024)
+        return self.default_estimate
@@ -0,0 +1,96 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id
+from .execution import run_command_line
+from .fingerprint import file_digest, get_tool_files, get_model_files
+import fcntl, hashlib, threading
+
+
+class ModelCache(object):
+    """
+    Content-addressed cache of prebuilt (explicit) models, e.g. models that storm exported to the DRN format.
+    Without the cache, each solver builds the same model from its PRISM/JANI description again. With the cache, the
+    model of each benchmark is built once and the invocations of all solvers load the prebuilt model instead.
+    The model is built by the same tool binary (or container image) as in the command of the invocation. The key of a
+    prebuilt model is a hash of the build command, the tool binary and the model files, so changing any of them results
+    in a new build. Invocations using exact arithmetic do not use prebuilt models. Models are built lazily (by the first worker that needs them) with the time limit of
+    that invocation. Other workers (also in other processes sharing the cache directory) wait for the build.
+    For each model, a file '<key>.json' stores the benchmark, the build command, the build time and whether the build
+    was successful. If it was not (or the tool can not load prebuilt models), the invocation is executed unchanged.
+    """
+
+    def __init__(self, settings, directory):
+        self.settings = settings
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.builds = dict()  # key -> build info of the models that were built or looked up by this process
+        ensure_directory(directory)
+
+    def get_key(self, tool, invocation, benchmark):
+        """ Returns the key of the prebuilt model of the given benchmark and invocation or None if it can not be prebuilt. """
+        command = tool.get_model_build_command(self.settings, invocation, benchmark, "")
+        if command is None or tool.get_prebuilt_model_format() is None:
+            return None
+        sha = hashlib.sha256()
+        sha.update(tool.get_name().encode("utf-8") + b"\0" + command.encode("utf-8"))
+        for filename in get_tool_files(command) + get_model_files(self.settings, benchmark.get_identifier()):
+            sha.update(b"\0" + str(file_digest(filename)).encode("utf-8"))
+        return sha.hexdigest()
+
+    def get_path(self, tool, key):
+        return os.path.join(self.directory, key + tool.get_prebuilt_model_format())
+
+    def _build(self, tool, invocation, benchmark, key, time_limit):
+        """ Builds the model unless it was built before (by any process). Returns the build info. """
+        info_path = os.path.join(self.directory, key + ".json")
+        with open(set_artifact_dir(os.path.join(self.directory, key + ".lock")), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.path.isfile(set_artifact_dir(info_path)):
+                    info = load_json(info_path)
+                    # retry failed builds if we have more time than the failed attempt
+                    if info["success"] or info["time-limit"] >= time_limit:
+                        return info
+                path = self.get_path(tool, key)
+                tmp_path = os.path.join(self.directory, key + ".tmp" + tool.get_prebuilt_model_format())
+                command = tool.get_model_build_command(self.settings, invocation, benchmark, tmp_path)
+                print("Building model of {} for the model cache.".format(benchmark.get_identifier()))
+                execution = run_command_line(command, time_limit)
+                success = not execution.timeout and execution.return_code == 0 and os.path.isfile(set_artifact_dir(tmp_path))
+                if success:
+                    os.replace(set_artifact_dir(tmp_path), set_artifact_dir(path))
+                elif os.path.isfile(set_artifact_dir(tmp_path)):
+                    os.remove(set_artifact_dir(tmp_path))
+                info = OrderedDict([("benchmark-id", benchmark.get_identifier()), ("tool", tool.get_name()),
+                                    ("command", command), ("model-build-time", execution.wall_time),
+                                    ("time-limit", time_limit), ("timeout", execution.timeout), ("success", success)])
+                if not success:
+                    print("WARN: Building the model of {} failed, its invocations build the model themselves.".format(
+                        benchmark.get_identifier()))
+                save_json(info, info_path)
+                return info
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def prepare(self, tool, invocation):
+        """
+        Builds the model of the given invocation (if necessary) and changes its command such that the prebuilt model is
+        used. Returns the path of the prebuilt model and the time it took to build it or None if the model is not cached.
+        """
+        benchmark = get_benchmark_from_id(self.settings, invocation.benchmark_id)
+        key = self.get_key(tool, invocation, benchmark)
+        if key is None:
+            return None
+        with self.lock:
+            info = self.builds.get(key)
+        if info is None:
+            info = self._build(tool, invocation, benchmark, key, invocation.time_limit)
+            with self.lock:
+                self.builds[key] = info
+        if not info["success"]:
+            return None
+        path = self.get_path(tool, key)
+        command = tool.use_prebuilt_model(self.settings, invocation, benchmark, path)
+        if command is None:
+            return None
+        invocation.command = command
+        return path, info["model-build-time"]
@@ -0,0 +1,180 @@
+from .utility import *
+from .invocation import Invocation
+from .sharding import get_invocation_cost, get_num_states
+from .journal import load_results
+
+# statistics of the model (found in the results of previous executions) that are used as features
+NUMERIC_STATISTICS = ["states", "transient-states", "non-bottom-SCCs", "bottom-SCCs", "max-non-bottom-SCC-size",
+                      "max-bottom-SCC-size", "max-SCC-chain-length"]
+RIDGE = 1e-3  # regularization of the least squares fit
+MIN_TIME = 1e-3  # in seconds, lower bound for the logarithm of times
+
+
+def _log(value):
+    return math.log(max(float(value), 0.0) + 1.0)
+
+
+def _solve(matrix, vector):
+    """ Solves the linear equation system matrix * x = vector using Gaussian elimination with partial pivoting. """
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            if factor != 0.0:
+                for c in range(col, n + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    result = [0.0] * n
+    for row in reversed(range(n)):
+        if abs(rows[row][row]) < 1e-12:
+            continue
+        result[row] = (rows[row][n] - sum(rows[row][c] * result[c] for c in range(row + 1, n))) / rows[row][row]
+    return result
+
+
+class RuntimePredictor(object):
+    """
+    Predicts the wallclock time of invocations with a linear regression of the logarithm of the time on
+        * the tool, configuration and solver (one weight for each combination),
+        * the precision (logarithm),
+        * the logarithms of the number of states and of the SCC/BSCC statistics of the model and its topology.
+    The model statistics are taken from results of previous executions (of any tool) on the same benchmark.
+    If they are unknown, the number of states from the index file of the model is used and an indicator feature is set.
+    The predictor is trained on the results in the logs directory, timeouts are included with the time limit as time.
+    Without training data, the static cost estimate used for sharding is returned.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.statistics = dict()  # benchmark id -> dict with the model statistics
+        self.features = []  # names of the features
+        self.weights = None
+        self.num_samples = 0
+        self.training_error = None
+        self._num_states_cache = dict()
+
+    def _add_statistics(self, result_json):
+        statistics = self.statistics.setdefault(result_json["benchmark-id"], dict())
+        for key in NUMERIC_STATISTICS:
+            if key in result_json and is_number(result_json[key]):
+                statistics[key] = float(result_json[key])
+        if "topology" in result_json:
+            statistics["topology"] = result_json["topology"]
+
+    def _get_feature_values(self, invocation):
+        """ Returns a dict from feature names to values for the given invocation. """
+        values = OrderedDict([("intercept", 1.0)])
+        values["solver:{}.{}.{}".format(invocation.tool, invocation.configuration_id, invocation.solver_id)] = 1.0
+        if is_number(invocation.precision) and float(invocation.precision) > 0:
+            values["log-precision"] = -math.log10(float(invocation.precision))
+        statistics = self.statistics.get(invocation.benchmark_id, dict())
+        if "states" not in statistics:
+            num_states = get_num_states(self.settings, invocation.benchmark_id, self._num_states_cache)
+            if num_states is not None:
+                statistics = dict(statistics)
+                statistics["states"] = num_states
+        for key in NUMERIC_STATISTICS:
+            if key in statistics:
+                values["log-" + key] = _log(statistics[key])
+            else:
+                values["unknown-" + key] = 1.0
+        if "topology" in statistics:
+            values["topology:" + statistics["topology"]] = 1.0
+        return values
+
+    def train(self, results=None):
+        """
+        Fits the model to the given result jsons (or the results in the logs directory if None).
+        Returns the number of results used for training.
+        """
+        if results is None:
+            results = load_results(self.settings)
+        for result_json in results:
+            self._add_statistics(result_json)
+        samples = []
+        for result_json in results:
+            if result_json.get("pruned", False) or "wallclock-time" not in result_json:
+                continue
+            if result_json.get("timeout", False):
+                time = result_json["time-limit"]
+            elif result_json.get("execution-error", False):
+                continue
+            else:
+                time = result_json["wallclock-time"]
+            samples.append((self._get_feature_values(Invocation(result_json)), math.log(max(float(time), MIN_TIME))))
+        self.num_samples = len(samples)
+        if self.num_samples == 0:
+            self.weights = None
+            return 0
+        self.features = sorted(set(name for values, target in samples for name in values))
+        index = dict((name, i) for i, name in enumerate(self.features))
+        n = len(self.features)
+        gram = [[0.0] * n for _ in range(n)]
+        moments = [0.0] * n
+        for values, target in samples:
+            entries = [(index[name], value) for name, value in values.items()]
+            for i, value_i in entries:
+                moments[i] += value_i * target
+                for j, value_j in entries:
+                    gram[i][j] += value_i * value_j
+        for i in range(n):
+            gram[i][i] += RIDGE * self.num_samples
+        self.weights = dict(zip(self.features, _solve(gram, moments)))
+        # root mean squared error in log space, i.e., predictions are typically off by a factor of exp(error)
+        self.training_error = math.sqrt(sum((self._predict_log(values) - target) ** 2 for values, target in samples)
+                                        / self.num_samples)
+        return self.num_samples
+
+    def _predict_log(self, values):
+        return sum(self.weights.get(name, 0.0) * value for name, value in values.items())
+
+    def predict(self, invocation):
+        """ Returns the predicted wallclock time (in seconds) of the invocation, at most its time limit. """
+        if self.weights is None:
+            return get_invocation_cost(self.settings, invocation, self._num_states_cache)
+        prediction = math.exp(self._predict_log(self._get_feature_values(invocation)))
+        if invocation.time_limit is not None:
+            prediction = min(prediction, float(invocation.time_limit))
+        return prediction
+
+    def to_json(self):
+        res = OrderedDict([("num-samples", self.num_samples), ("training-error", self.training_error)])
+        res["weights"] = OrderedDict(sorted(self.weights.items())) if self.weights is not None else None
+        res["statistics"] = self.statistics
+        return res
+
+    def save(self, path):
+        """ Saves the trained model, e.g. so that all shards of a SLURM array use the same predictions. """
+        save_json(self.to_json(), path)
+
+    def load(self, path):
+        model_json = load_json(path)
+        self.num_samples = model_json["num-samples"]
+        self.training_error = model_json["training-error"]
+        self.weights = model_json["weights"]
+        self.features = sorted(self.weights.keys()) if self.weights is not None else []
+        self.statistics = model_json["statistics"]
+
+
+def get_model_path(settings):
+    """ Returns the path of the model snapshot in the results directory. """
+    return os.path.join(settings.results_dir(), "runtime-model.json")
+
+
+def is_saved_model_up_to_date(settings):
+    """
+    Returns true if the model snapshot exists and is newer than the results, i.e., no result was added to (or replaced in)
+    the logs directory since the model was saved. Results are saved atomically (via rename), which updates the directory.
+    """
+    try:
+        model_mtime = os.stat(set_artifact_dir(get_model_path(settings))).st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return os.stat(set_artifact_dir(settings.results_dir_logs())).st_mtime_ns <= model_mtime
+    except OSError:
+        return True
@@ -0,0 +1,107 @@
+from .utility import *
+import threading, types
+
+
+class _Stage(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.profiler.enabled:
+            self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.start is not None:
+            self.profiler.add(self.name, time.monotonic() - self.start)
+        return False
+
+
+class Profiler(object):
+    """
+    Records the cumulative time and number of calls of the stages of the harness (e.g. checking invocations, executing
+    the tool, parsing its output, writing results) and of the functions of instrumented modules (e.g. the tool adapters).
+    Stages can be nested, the time of a stage includes the time of the stages within. With parallel workers, the times
+    of all workers are summed up. If the profiler is not enabled, nothing is recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stats = OrderedDict()  # name -> [number of calls, cumulative time]
+        self.start_time = None
+
+    def enable(self):
+        self.enabled = True
+        self.start_time = time.monotonic()
+
+    def add(self, name, duration):
+        with self.lock:
+            entry = self.stats.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+
+    def stage(self, name):
+        """ Returns a context manager that records the time spent in the given stage. """
+        return _Stage(self, name)
+
+    def _wrap(self, function, name):
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.add(name, time.monotonic() - start)
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def instrument(self, module, prefix=None):
+        """
+        Replaces the public functions that are defined in the given module by wrappers that record their calls.
+        Only calls via the module (e.g. 'storm.get_num_states(...)') are recorded.
+        """
+        if not self.enabled:
+            return
+        if prefix is None:
+            prefix = module.__name__.split(".")[-1] + "."
+        for name, value in list(vars(module).items()):
+            if isinstance(value, types.FunctionType) and value.__module__ == module.__name__ and not name.startswith("_") \
+                    and not hasattr(value, "__wrapped__"):
+                setattr(module, name, self._wrap(value, prefix + name))
+
+    def report(self):
+        """ Returns the recorded stats, sorted by cumulative time. """
+        res = OrderedDict()
+        res["total-time"] = time.monotonic() - self.start_time if self.start_time is not None else None
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: -item[1][1])
+        entries = OrderedDict()
+        for name, (calls, total) in stats:
+            entries[name] = OrderedDict([("calls", calls), ("time", total), ("time-per-call", total / calls)])
+        res["stages"] = entries
+        if "invocation" in self.stats and "execute" in self.stats:
+            # everything the harness does for an invocation besides running the tool
+            num_invocations = self.stats["invocation"][0]
+            res["harness-overhead-per-invocation"] = (self.stats["invocation"][1] - self.stats["execute"][1]) / num_invocations
+        return res
+
+    def save(self, path):
+        """ Saves the report as json file and prints a summary. """
+        report = self.report()
+        save_json(report, path)
+        print("\nProfile (total time {:.2f}s), saved to '{}':".format(report["total-time"], path))
+        print("{:>10} {:>12} {:>14}  {}".format("calls", "time [s]", "per call [ms]", "stage"))
+        for name, entry in report["stages"].items():
+            print("{:>10} {:>12.3f} {:>14.3f}  {}".format(entry["calls"], entry["time"], 1000 * entry["time-per-call"], name))
+        if "harness-overhead-per-invocation" in report:
+            print("Harness overhead per invocation: {:.1f} ms".format(1000 * report["harness-overhead-per-invocation"]))
+
+
+profiler = Profiler()
@@ -0,0 +1,111 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id
+from .invocation import Invocation
+from .journal import load_results
+import threading
+
+
+class Pruning(object):
+    """
+    Skips instances that are at least as large as an instance on which the same tool, configuration, solver and precision
+    already ran into a timeout or memout. Instances of a family (same model and property, different parameters) are
+    compared by their number of states if it is known for both. Otherwise, an instance is at least as large if each of its
+    (numeric) parameters is at least as large, e.g. brp 2048-5 is larger than brp 1024-5 and 2048-4 while 2048-4 and 1024-5
+    are incomparable. Pruned instances are recorded as timeouts that are marked with 'pruned'.
+    """
+
+    def __init__(self, settings, load_previous_results=True, results=None):
+        """ Failures of previous results are taken into account if load_previous_results is set (see load_results). """
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.sizes = dict()  # benchmark id -> (family, number of states, parameter values) or None if unknown
+        self.failed = dict()  # family of an invocation -> list of (identifier, size) of failed invocations
+        if load_previous_results:
+            self._load_previous_results(results if results is not None else load_results(settings))
+
+    def _load_previous_results(self, results):
+        for result_json in results:
+            self.record(Invocation(result_json), result_json)
+
+    def get_size(self, benchmark_id):
+        """ Returns (family, number of states, parameter values) of the benchmark or None if it is unknown. """
+        if benchmark_id not in self.sizes:
+            try:
+                benchmark = get_benchmark_from_id(self.settings, benchmark_id)
+                family = (benchmark.get_model_short_name(), benchmark.property)
+                parameters = [try_to_number(p["value"]) for p in benchmark.get_parameters()]
+                self.sizes[benchmark_id] = (family, benchmark.get_num_states(), parameters)
+            except Exception:
+                self.sizes[benchmark_id] = None
+        return self.sizes[benchmark_id]
+
+    def get_family(self, invocation):
+        size = self.get_size(invocation.benchmark_id)
+        if size is None:
+            return None
+        return invocation.tool, invocation.configuration_id, invocation.solver_id, str(invocation.precision), size[0]
+
+    @staticmethod
+    def is_at_least_as_large(size, other_size):
+        """ Returns true if the instance with the given size is at least as large as the instance with the other size. """
+        family, num_states, parameters = size
+        other_family, other_num_states, other_parameters = other_size
+        if family != other_family:
+            return False
+        if num_states is not None and other_num_states is not None:
+            return num_states >= other_num_states
+        if len(parameters) != len(other_parameters) or len(parameters) == 0:
+            return False
+        for value, other_value in zip(parameters, other_parameters):
+            if is_number(value) and is_number(other_value):
+                if value < other_value:
+                    return False
+            elif value != other_value:
+                return False
+        return True
+
+    def order(self, invocations):
+        """
+        Returns the invocations such that the instances of each family are executed in ascending order of their sizes.
+        The given order (e.g. longest predicted runtime first) is kept otherwise: the instances of a family are only
+        permuted among the positions that the family occupies, invocations with unknown size keep their position.
+        """
+        positions = OrderedDict()  # family -> positions of its invocations
+        for index, invocation in enumerate(invocations):
+            family = self.get_family(invocation)
+            if family is not None:
+                positions.setdefault(family, []).append(index)
+        result = list(invocations)
+        for family, family_positions in positions.items():
+            keys = []
+            for index in family_positions:
+                _, num_states, parameters = self.get_size(invocations[index].benchmark_id)
+                numeric_parameters = [float(p) if is_number(p) else 0.0 for p in parameters]
+                keys.append((0 if num_states is not None else 1, num_states or 0, numeric_parameters, index))
+            for position, key in zip(family_positions, sorted(keys)):
+                result[position] = invocations[key[-1]]
+        return result
+
+    def record(self, invocation, result_json):
+        """ Remembers the invocation if it ran into a timeout or memout. Pruned invocations are no cause for pruning. """
+        if result_json.get("pruned", False):
+            return
+        if not result_json.get("timeout", False) and not result_json.get("memout", False):
+            return
+        family = self.get_family(invocation)
+        if family is None:
+            return
+        with self.lock:
+            self.failed.setdefault(family, []).append((invocation.get_identifier(), self.get_size(invocation.benchmark_id)))
+
+    def get_pruning_cause(self, invocation):
+        """ Returns the identifier of a failed invocation that the given invocation is at least as large as (or None). """
+        family = self.get_family(invocation)
+        if family is None:
+            return None
+        size = self.get_size(invocation.benchmark_id)
+        with self.lock:
+            for identifier, failed_size in self.failed.get(family, []):
+                if identifier != invocation.get_identifier() and Pruning.is_at_least_as_large(size, failed_size):
+                    return identifier
+        return None
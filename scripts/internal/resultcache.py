@@ -0,0 +1,141 @@
+from .utility import *
+from .journal import Journal, get_result_status
+import hashlib, threading
+
+
+class ResultCache(object):
+    """
+    Content-addressed cache of results that can be shared by several result directories (e.g. overlapping experiment sets).
+    The key of a result is a hash of the fingerprint of the invocation (its command, the tool binary or container image and
+    the model files, see invocation_fingerprint), the task, the time and memory limits and the execution mode (e.g. the
+    warm-up strategy or whether prebuilt models are used), since the mode changes the measured times. Each entry is a directory
+    '<key[:2]>/<key>' containing the result json, the log and (if present) the exported values.
+    Only results with a final status (see Journal.FINAL_STATUSES) are cached.
+    If the cache exceeds max_size (in MiB), the least recently used entries are removed.
+    """
+
+    def __init__(self, settings, directory, max_size=None, mode=None):
+        self.settings = settings
+        self.directory = directory
+        self.max_size = max_size
+        self.mode = mode if mode is not None else OrderedDict()  # name -> value of the options that affect measurements
+        self.lock = threading.Lock()
+        ensure_directory(directory)
+        self.size = self._get_entries_and_size()[1] if max_size is not None else 0  # estimate in bytes
+
+    def get_key(self, invocation, fingerprint):
+        sha = hashlib.sha256()
+        for value in [fingerprint, self.settings.task(), invocation.time_limit, invocation.memory_limit, invocation.export]:
+            sha.update(str(value).encode("utf-8") + b"\0")
+        for name, value in self.mode.items():
+            sha.update("{}={}".format(name, value).encode("utf-8") + b"\0")
+        return sha.hexdigest()
+
+    def _get_entry_directory(self, key):
+        return os.path.join(set_artifact_dir(self.directory), key[:2], key)
+
+    def lookup(self, invocation, fingerprint):
+        """
+        Returns the cached result of the given invocation (or None if there is none). The log and the exported values
+        are copied to the results directory and the result json is saved as if the invocation had been executed.
+        """
+        entry_directory = self._get_entry_directory(self.get_key(invocation, fingerprint))
+        try:
+            cached_json = load_json(os.path.join(entry_directory, "result.json"))
+        except (OSError, ValueError):
+            return None
+        identifier = invocation.get_identifier()
+        result_json = OrderedDict(cached_json)
+        for key, value in invocation.to_json().items():
+            result_json[key] = value
+        result_json["log"] = identifier + ".log"
+        copied_files = []
+        try:
+            # the modification time of the entry is used for evicting the least recently used entries
+            os.utime(entry_directory)
+            log_path = set_artifact_dir(os.path.join(self.settings.results_dir_logs(), result_json["log"]))
+            copied_files.append(log_path)
+            shutil.copyfile(os.path.join(entry_directory, "log"), log_path)
+            if "export-value-file" in cached_json:
+                export_value_file = os.path.join(self.settings.results_dir_exports(), identifier) \
+                                    + os.path.splitext(cached_json["export-value-file"])[1]
+                copied_files.append(set_artifact_dir(export_value_file))
+                shutil.copyfile(os.path.join(entry_directory, "export"), set_artifact_dir(export_value_file))
+                result_json["export-value-file"] = export_value_file
+        except OSError:
+            # the entry was evicted (e.g. by another process) in the meantime, so the invocation is executed
+            for path in copied_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return None
+        result_json["cached"] = True
+        result_json["notes"] = list(cached_json.get("notes", [])) + ["Result taken from the result cache ({}).".format(
+            os.path.basename(entry_directory))]
+        save_json(result_json, os.path.join(self.settings.results_dir_logs(), identifier + ".json"))
+        return result_json
+
+    def store(self, invocation, fingerprint, result_json, replace=False):
+        """ Adds the result of the given (executed) invocation to the cache. An existing entry is only replaced if replace is set. """
+        if get_result_status(result_json) not in Journal.FINAL_STATUSES or result_json.get("pruned", False):
+            return
+        entry_directory = self._get_entry_directory(self.get_key(invocation, fingerprint))
+        if os.path.isdir(entry_directory):
+            if not replace:
+                return
+            shutil.rmtree(entry_directory, ignore_errors=True)
+        ensure_directory(os.path.dirname(entry_directory))
+        # the entry is created in a temporary directory and then renamed, so other processes never see partial entries
+        tmp_directory = tempfile.mkdtemp(dir=os.path.dirname(entry_directory), prefix=".tmp-")
+        os.chmod(tmp_directory, 0o755)
+        try:
+            shutil.copyfile(set_artifact_dir(os.path.join(self.settings.results_dir_logs(), result_json["log"])),
+                            os.path.join(tmp_directory, "log"))
+            if "export-value-file" in result_json:
+                shutil.copyfile(set_artifact_dir(result_json["export-value-file"]), os.path.join(tmp_directory, "export"))
+            save_json(result_json, os.path.join(tmp_directory, "result.json"))
+            entry_size = sum(os.path.getsize(os.path.join(tmp_directory, name)) for name in os.listdir(tmp_directory))
+            os.rename(tmp_directory, entry_directory)
+        except OSError:
+            # e.g. another process stored the same entry in the meantime
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            return
+        if self.max_size is not None:
+            with self.lock:
+                self.size += entry_size
+                if self.size > self.max_size * 1024 * 1024:
+                    self.evict()
+
+    def _get_entries_and_size(self):
+        """ Returns a list of (last use, size, directory) of all entries and their total size (in bytes). """
+        entries = []
+        directory = set_artifact_dir(self.directory)
+        for prefix in os.listdir(directory):
+            if not os.path.isdir(os.path.join(directory, prefix)):
+                continue
+            for key in os.listdir(os.path.join(directory, prefix)):
+                if key.startswith("."):
+                    # temporary directory of an entry that is currently stored
+                    continue
+                entry_directory = os.path.join(directory, prefix, key)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry_directory, name)) for name in os.listdir(entry_directory))
+                    entries.append((os.stat(entry_directory).st_mtime, size, entry_directory))
+                except OSError:
+                    # removed by another process
+                    continue
+        return entries, sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """ Removes the least recently used entries until the cache is smaller than its maximal size. """
+        entries, self.size = self._get_entries_and_size()
+        num_removed = 0
+        for last_use, size, entry_directory in sorted(entries):
+            if self.size <= self.max_size * 1024 * 1024:
+                break
+            shutil.rmtree(entry_directory, ignore_errors=True)
+            self.size -= size
+            num_removed += 1
+        if num_removed > 0:
+            print("\nRemoved {} least recently used entries from the result cache.".format(num_removed))
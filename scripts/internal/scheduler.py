@@ -0,0 +1,182 @@
+from .utility import *
+from .execution import terminate_running_executions
+import threading, traceback
+
+
+def get_core_sets(num_jobs, cpus_per_job=None):
+    """
+    Splits the cores this process may run on into num_jobs disjoint core sets.
+    If cpus_per_job is None, the available cores are distributed evenly (remaining cores stay unused).
+    """
+    available = sorted(os.sched_getaffinity(0))
+    if cpus_per_job is None:
+        cpus_per_job = max(1, len(available) // num_jobs)
+    if num_jobs * cpus_per_job > len(available):
+        raise AssertionError(
+            "Unable to pin {} jobs to {} core(s) each: only {} cores are available.".format(num_jobs, cpus_per_job,
+                                                                                           len(available)))
+    return [available[i * cpus_per_job:(i + 1) * cpus_per_job] for i in range(num_jobs)]
+
+
+class Worker(object):
+    """ A worker of the scheduler. Tool processes started by a worker are pinned to its core set. """
+
+    def __init__(self, index, cpus):
+        self.index = index
+        self.cpus = cpus
+
+
+class Scheduler(object):
+    """
+    Executes invocations on a pool of workers.
+    Each worker runs one invocation at a time, so with a single worker the invocations are executed sequentially.
+    If a memory budget (in MiB) is given, an invocation is only started if its estimated memory consumption fits into the
+    part of the budget that is not reserved by running invocations. Otherwise, it stays queued.
+    """
+
+    def __init__(self, num_jobs=1, cpus_per_job=None, pin=None, memory_budget=None, memory_estimator=None):
+        if num_jobs < 1:
+            raise AssertionError("The number of jobs has to be at least 1 but got {}.".format(num_jobs))
+        if pin is None:
+            # only pin if there is more than one worker, sequential runs behave as before
+            pin = num_jobs > 1
+        if pin:
+            core_sets = get_core_sets(num_jobs, cpus_per_job)
+        else:
+            core_sets = [None] * num_jobs
+        if memory_budget is not None and memory_estimator is None:
+            raise AssertionError("A memory budget requires a memory estimator.")
+        self.workers = [Worker(i, cpus) for i, cpus in enumerate(core_sets)]
+        self.memory_budget = memory_budget
+        self.memory_estimator = memory_estimator
+        self.lock = threading.Condition()
+        self.pending = []
+        self.queue = None
+        self.num_running = 0
+        self.reserved_memory = 0.0
+        self.interrupted = False
+
+    def _fits(self, estimate):
+        if self.memory_budget is None or self.num_running == 0:
+            # if nothing is running, we have to start the invocation anyway (even if it exceeds the budget)
+            return True
+        return self.reserved_memory + estimate <= self.memory_budget
+
+    def _next(self):
+        """
+        Blocks until an invocation can be admitted and returns the (index, invocation, memory estimate, work item) tuple
+        or None if there is nothing left to do. The work item is only set if the invocations are claimed from a queue.
+        """
+        item = None
+        candidates = self.pending
+        if self.queue is not None:
+            if self.interrupted:
+                return None
+            item = self.queue.claim()
+            if item is None:
+                return None
+            candidates = [(item.index, item.invocation, self._estimate(item.invocation))]
+        with self.lock:
+            while True:
+                if self.interrupted or len(candidates) == 0:
+                    if item is not None:
+                        self.queue.release(item)
+                    return None
+                for i, (index, invocation, estimate) in enumerate(candidates):
+                    if self._fits(estimate):
+                        del candidates[i]
+                        self.num_running += 1
+                        self.reserved_memory += estimate
+                        return index, invocation, estimate, item
+                # wait until a running invocation releases its memory
+                self.lock.wait()
+
+    def _release(self, estimate):
+        with self.lock:
+            self.num_running -= 1
+            self.reserved_memory -= estimate
+            self.lock.notify_all()
+
+    def _work(self, worker, execute_fn, on_finished):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            index, invocation, estimate, work_item = item
+            try:
+                execute_fn(invocation, worker)
+            except Exception:
+                print("\nERROR while processing invocation #{}: {}".format(index, invocation.get_identifier()))
+                traceback.print_exc()
+            except BaseException:
+                # interrupted, so another worker should execute the invocation
+                if work_item is not None:
+                    self.queue.release(work_item)
+                    work_item = None
+                raise
+            finally:
+                self._release(estimate)
+                if work_item is not None:
+                    self.queue.complete(work_item)
+            if on_finished is not None:
+                with self.lock:
+                    on_finished(index, invocation)
+
+    def _estimate(self, invocation):
+        if self.memory_budget is None:
+            return 0.0
+        estimate = self.memory_estimator.estimate(invocation)
+        if estimate is None:
+            # without an estimate, we assume that the invocation needs its share of the budget
+            estimate = self.memory_budget / len(self.workers)
+        return estimate
+
+    def run(self, invocations, execute_fn, on_finished=None):
+        """
+        Calls execute_fn(invocation, worker) for each invocation.
+        on_finished(index, invocation) is called after each invocation while holding the scheduler lock,
+        i.e., it never runs concurrently with itself.
+        """
+        self.pending = [(index, invocation, self._estimate(invocation)) for index, invocation in enumerate(invocations)]
+        self.queue = None
+        self.interrupted = False
+        if self.memory_budget is not None:
+            too_large = [inv for (i, inv, estimate) in self.pending if estimate > self.memory_budget]
+            if len(too_large) > 0:
+                print("WARN: The estimated memory of {} invocation(s) exceeds the memory budget of {} MiB. "
+                      "They will be executed without other invocations running in parallel.".format(len(too_large),
+                                                                                                    self.memory_budget))
+        self._run_workers(execute_fn, on_finished)
+
+    def run_queue(self, queue, execute_fn, on_finished=None):
+        """
+        Like run, but each worker claims the invocations from the given WorkQueue until it is empty.
+        The index passed to on_finished is the sequence number of the invocation in the queue.
+        """
+        self.pending = []
+        self.queue = queue
+        self.interrupted = False
+        self._run_workers(execute_fn, on_finished)
+
+    def _run_workers(self, execute_fn, on_finished):
+        if len(self.workers) == 1:
+            self._work(self.workers[0], execute_fn, on_finished)
+            return
+        threads = [threading.Thread(target=self._work, args=(worker, execute_fn, on_finished), daemon=True)
+                   for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                # join with a timeout so that the main thread still receives KeyboardInterrupts
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            with self.lock:
+                self.interrupted = True
+                self.lock.notify_all()
+            if self.queue is not None:
+                self.queue.release_all()
+            # tools run in their own sessions, so they do not receive the interrupt themselves
+            terminate_running_executions()
+            raise
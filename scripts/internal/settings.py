@@ -14,11 +14,19 @@ class Settings():
 
         # set and create directories
         self.json_data["benchmarks-directory"] = "$ARTIFACT_DIR/benchmarks/"
+        self.json_data["benchmark-catalog"] = os.path.join(self.benchmark_dir(), "catalog.json")
         self.json_data["results-directory"] = results_directory
         self.json_data["logs-directory"] = os.path.join(self.results_dir(), "logs")
         self.json_data["export-directory"] = os.path.join(self.results_dir_logs(), "exports")
         self.json_data["plots-directory"] = os.path.join(self.results_dir(), "plots")
         self.json_data["tables-directory"] = os.path.join(self.results_dir(), "tables")
+        # optional cache of prebuilt models, e.g. shared by several result directories
+        self.json_data["model-cache-directory"] = None
+        # optional cache of results, e.g. shared by several result directories
+        self.json_data["result-cache-directory"] = None
+        self.json_data["result-cache-size"] = None  # in MiB, unlimited if None
+        # execute containerized tools in persistent container instances (one per worker and image)
+        self.json_data["container-instances"] = False
 
 
     def test_result_dirs(self):
@@ -52,6 +60,10 @@ class Settings():
         """ Retrieves the directory where the benchmarks lie. """
         return self.json_data["benchmarks-directory"]
 
+    def benchmark_catalog(self):
+        """ Retrieves the compiled catalog of the benchmarks (see build_benchmark_catalog). """
+        return self.json_data["benchmark-catalog"]
+
     def results_dir_logs(self):
         """ Retrieves the directory in which the tool logs are stored."""
         return self.json_data["logs-directory"]
@@ -68,6 +80,22 @@ class Settings():
         """ Retrieves the directory to which the tool execution result table is stored. """
         return self.json_data["tables-directory"]
 
+    def model_cache_dir(self):
+        """ Retrieves the directory in which prebuilt models are cached or None if models are not cached. """
+        return self.json_data["model-cache-directory"]
+
+    def result_cache_dir(self):
+        """ Retrieves the directory in which results are cached or None if results are not cached. """
+        return self.json_data["result-cache-directory"]
+
+    def result_cache_size(self):
+        """ Retrieves the maximal size (in MiB) of the result cache or None if it is unlimited. """
+        return self.json_data["result-cache-size"]
+
+    def use_container_instances(self):
+        """ Retrieves whether containerized tools are executed in persistent container instances (see ContainerInstances). """
+        return self.json_data["container-instances"]
+
     def filtered_paths(self):
         """ returns a list of paths (e.g. home directory) that should be filtered from commands in logfiles """
         return self.json_data["filtered-paths"]
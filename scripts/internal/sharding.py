@@ -0,0 +1,79 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id
+from .invocation import Invocation
+
+# Static cost model for balancing shards. It must not depend on results of previous runs since all shards
+# (e.g. the tasks of a SLURM array) have to compute exactly the same partition independently.
+BASE_COST = 1.0  # in seconds, e.g. starting the tool and parsing the model
+SECONDS_PER_STATE = 1e-5
+UNKNOWN_SIZE_COST_FRACTION = 0.1  # models without known number of states are assumed to take this fraction of the time limit
+
+
+def parse_shard(shard_str: str):
+    """ Parses a shard specification 'k/K' (1 <= k <= K) and returns the pair (k, K). """
+    parts = shard_str.split("/")
+    if len(parts) != 2 or not parts[0].isdigit() or not parts[1].isdigit():
+        raise AssertionError("Expected a shard of the form 'k/K' but got '{}' instead.".format(shard_str))
+    k, num_shards = int(parts[0]), int(parts[1])
+    if num_shards < 1 or k < 1 or k > num_shards:
+        raise AssertionError("Shard '{}' is out of range: k has to be between 1 and K.".format(shard_str))
+    return k, num_shards
+
+
+def load_invocation_files(filenames):
+    """ Returns a list of pairs (filename, invocations). Files that are not valid invocation files are skipped. """
+    from .invocationstore import load_invocations_json  # the invocation store depends on this module
+    result = []
+    for filename in filenames:
+        try:
+            invocations = [Invocation(inv) for inv in load_invocations_json(filename)]
+        except Exception as e:
+            print("WARN: Skipping '{}' since it is not a valid invocations file: {}".format(filename, e))
+            continue
+        if len(invocations) > 0:
+            result.append((filename, invocations))
+    return result
+
+
+def get_num_states(settings, benchmark_id, num_states_cache):
+    """ Returns the number of states of the benchmark according to the index file of the model (or None if unknown). """
+    if benchmark_id not in num_states_cache:
+        try:
+            num_states_cache[benchmark_id] = get_benchmark_from_id(settings, benchmark_id).get_num_states()
+        except LookupError:
+            num_states_cache[benchmark_id] = None
+    return num_states_cache[benchmark_id]
+
+
+def get_invocation_cost(settings, invocation, num_states_cache=None):
+    """ Returns the estimated runtime (in seconds) of the invocation, based on the size of the model and its time limit. """
+    if num_states_cache is None:
+        num_states_cache = dict()
+    num_states = get_num_states(settings, invocation.benchmark_id, num_states_cache)
+    time_limit = invocation.time_limit if invocation.time_limit is not None else float("inf")
+    if num_states is None:
+        return UNKNOWN_SIZE_COST_FRACTION * time_limit if time_limit != float("inf") else BASE_COST
+    return min(time_limit, BASE_COST + num_states * SECONDS_PER_STATE)
+
+
+def partition(costs, num_shards):
+    """
+    Distributes the items with the given costs to num_shards shards using the longest-processing-time-first rule:
+    items are assigned in descending order of their costs to the shard with the smallest total cost so far.
+    Ties are broken by index, so the partition is deterministic. Returns the list of item indices of each shard.
+    """
+    shards = [[] for _ in range(num_shards)]
+    loads = [0.0] * num_shards
+    for index in sorted(range(len(costs)), key=lambda i: (-costs[i], i)):
+        shard = min(range(num_shards), key=lambda s: (loads[s], s))
+        shards[shard].append(index)
+        loads[shard] += costs[index]
+    return [sorted(shard) for shard in shards]
+
+
+def select_shard(settings, invocations, k, num_shards, costs=None):
+    """ Returns the indices of the invocations that belong to shard k (1-based) of num_shards. """
+    if costs is None:
+        num_states_cache = dict()
+        costs = [get_invocation_cost(settings, invocation, num_states_cache) for invocation in invocations]
+    return partition(costs, num_shards)[k - 1]
@@ -0,0 +1,126 @@
+from .utility import *
+from .benchmark import get_benchmark_from_id
+from .tools import greatspn, sds, storm, prism
+import fnmatch
+
+SPEC_TOOLS = OrderedDict([("storm", storm), ("prism", prism), ("sds", sds), ("greatspn", greatspn)])
+MODEL_TYPES = ["dtmc", "ctmc"]
+
+
+def load_benchmark_selection(settings, benchmark_selection):
+    """ Loads the benchmarks of the given benchmark selection (.csv) file and returns them grouped by model type. """
+    benchmarks_csv = load_csv(benchmark_selection)
+    benchmarks = OrderedDict([(model_type, []) for model_type in MODEL_TYPES])
+    for benchmark_csv in benchmarks_csv:
+        if len(benchmark_csv) > 4:
+            benchmark_id = "{}.property{}.{}".format(benchmark_csv[0], benchmark_csv[4], benchmark_csv[3])
+        elif len(benchmark_csv) == 4:
+            benchmark_id = "{}.{}".format(benchmark_csv[0], benchmark_csv[3])
+        else:
+            benchmark_id = "{}".format(benchmark_csv[0])
+        benchmark = get_benchmark_from_id(settings, benchmark_id)
+        benchmarks[benchmark.get_model_type()].append(benchmark)
+    return benchmarks
+
+
+def load_spec(path):
+    """
+    Loads an experiment specification from a .json or .toml file, e.g.
+        benchmarks = "$ARTIFACT_DIR/benchmarks/stationary_benchmarks.csv"
+        model-types = ["dtmc", "ctmc"]        # optional, all model types per default
+        time-limit = 1800
+        memory-limit = 8192                   # optional, in MiB
+        export = false
+
+        [[experiments]]
+        tool = "storm"
+        executable = "$ARTIFACT_DIR/bin/storm" # optional
+        solvers = ["classic-*", "evt*-ii"]      # optional, shell-style patterns of solver ids, all solvers per default
+        configurations = ["sparse"]            # optional, patterns of configuration ids, all configurations per default
+        precisions = [1e-3, 1e-6]
+        time-limit = 600                       # optional, overrides the global value (also possible for model-types and export)
+    """
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise AssertionError("Loading '{}' requires Python 3.11 (tomllib), use a .json spec instead.".format(path))
+        with open(set_artifact_dir(path), 'rb') as spec_file:
+            spec = tomllib.load(spec_file)
+    else:
+        spec = load_json(path)
+    for key in ["benchmarks", "time-limit", "experiments"]:
+        if key not in spec:
+            raise AssertionError("The spec '{}' has no entry '{}'.".format(path, key))
+    for experiment in spec["experiments"]:
+        if experiment.get("tool") not in SPEC_TOOLS:
+            raise AssertionError("Unknown tool '{}' in spec '{}', expected one of {}.".format(
+                experiment.get("tool"), path, list(SPEC_TOOLS)))
+        if len(experiment.get("precisions", [])) == 0 or not all(is_number(p) and float(p) > 0 for p in experiment["precisions"]):
+            raise AssertionError("Expected a non-empty list of precisions >0 for tool '{}' in spec '{}'.".format(
+                experiment["tool"], path))
+        for model_type in experiment.get("model-types", spec.get("model-types", MODEL_TYPES)):
+            if model_type not in MODEL_TYPES:
+                raise AssertionError("Unknown model type '{}' in spec '{}'.".format(model_type, path))
+    return spec
+
+
+def _select(items, patterns, kind, tool_name):
+    """ Returns the solvers or configurations whose identifier matches one of the given patterns (all if None). """
+    if patterns is None:
+        return items
+    for pattern in patterns:
+        if not any(fnmatch.fnmatchcase(item.identifier, pattern) for item in items):
+            raise AssertionError("The pattern '{}' does not match any {} of {} ({}).".format(
+                pattern, kind, tool_name, ", ".join(item.identifier for item in items)))
+    return [item for item in items if any(fnmatch.fnmatchcase(item.identifier, pattern) for pattern in patterns)]
+
+
+def iterate_spec_invocations(settings, spec, unsupported=None):
+    """
+    Lazily expands the spec into invocations (via tool.get_invocation), i.e., invocations are created one after another.
+    Unsupported combinations are skipped and their identifiers (and notes) are appended to unsupported (if given).
+    Combinations that yield an already created invocation (e.g. direct solvers, which ignore the precision) are skipped.
+    The executables given in the spec are set in the settings.
+    """
+    benchmarks = load_benchmark_selection(settings, spec["benchmarks"])
+    identifiers = set()
+    for experiment in spec["experiments"]:
+        tool = SPEC_TOOLS[experiment["tool"]]
+        if "executable" in experiment:
+            settings.json_data[tool.get_name() + "-executable"] = experiment["executable"]
+        configurations = _select(tool.get_configurations(settings.task()), experiment.get("configurations"), "configuration", tool.get_name())
+        solvers = _select(tool.get_solvers(settings.task()), experiment.get("solvers"), "solver", tool.get_name())
+        time_limit = experiment.get("time-limit", spec["time-limit"])
+        memory_limit = experiment.get("memory-limit", spec.get("memory-limit"))
+        export = experiment.get("export", spec.get("export", False)) and tool.get_export_format() is not None
+        for model_type in experiment.get("model-types", spec.get("model-types", MODEL_TYPES)):
+            for benchmark in benchmarks[model_type]:
+                for configuration in configurations:
+                    for solver in solvers:
+                        for precision in experiment["precisions"]:
+                            invocation = tool.get_invocation(settings, benchmark, configuration, solver, float(precision), export)
+                            if invocation.command == "":
+                                if unsupported is not None:
+                                    unsupported.append(invocation.get_identifier() + ": " + invocation.note)
+                                continue
+                            if invocation.get_identifier() in identifiers:
+                                continue
+                            identifiers.add(invocation.get_identifier())
+                            invocation.time_limit = time_limit
+                            if memory_limit is not None:
+                                invocation.memory_limit = float(memory_limit)
+                            yield invocation
+
+
+def save_invocations(invocations, path):
+    """ Writes the given invocations (e.g. a generator) to an invocations file one after another. Returns their number. """
+    num_invocations = 0
+    with open_atomic(path, encoding="utf-8") as invocations_file:
+        invocations_file.write("[")
+        for invocation in invocations:
+            invocations_file.write(",\n" if num_invocations > 0 else "\n")
+            invocations_file.write(json.dumps(invocation.to_json(), ensure_ascii=False, indent='\t'))
+            num_invocations += 1
+        invocations_file.write("\n]")
+    return num_invocations
@@ -42,6 +42,19 @@ def is_benchmark_supported(settings, benchmark: Benchmark):
     if len( benchmark.get_original_filename()) == 0: return False
     return benchmark.get_original_filename()[0].lower().endswith(".pnpro")
 
+def get_prebuilt_model_format():
+    """ NA """
+    return None
+
+def get_model_build_command(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+def use_prebuilt_model(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+
 def get_invocation(settings, benchmark: Benchmark, configuration: Configuration, solver: Solver, precision, export):
     """
     Returns an invocations that invokes the tool for the given benchmark and the given configuration.
@@ -167,6 +180,12 @@ def get_max_bscc_size(execution: Execution):
     """
     return None
 
+def get_timing_info(execution: Execution):
+    """
+    NA
+    """
+    return None
+
 def is_not_supported(logfile):
     """
     Returns true if the logfile contains error messages that mean that the input is not supported.
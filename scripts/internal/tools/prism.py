@@ -1,3 +1,5 @@
+import re
+
 from ..benchmark import Benchmark
 from ..invocation import Invocation
 from ..execution import *
@@ -55,6 +57,19 @@ def is_benchmark_supported(settings, benchmark: Benchmark):
     return benchmark.is_dtmc() or benchmark.is_ctmc()
 
 
+def get_prebuilt_model_format():
+    """ NA """
+    return None
+
+def get_model_build_command(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+def use_prebuilt_model(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+
 def get_invocation(settings, benchmark: Benchmark, configuration: Configuration, solver: Solver, precision, export):
     """
     Returns an invocations that invokes the tool for the given benchmark and the given prism configuration.
@@ -273,3 +288,18 @@ def get_max_bscc_size(execution: Execution):
     """
     return None
 
+
+def get_timing_info(execution: Execution):
+    """
+    Returns the times (in seconds) that prism reports as a dict (or None if there is none), i.e., '<phase>-time' for each
+    'Time for <phase>: <t> seconds.' line, e.g. 'model-construction-time' and 'steady-state-probability-computation-time'.
+    Times of phases that occur multiple times are summed up.
+    """
+    log = execution.concatenate_logs()
+
+    result = OrderedDict()
+    for phase, value in re.findall(r"^Time for ([^:\n]+): ([0-9.eE+-]+) seconds\.$", log, re.MULTILINE):
+        key = phase.strip().lower().replace(" ", "-") + "-time"
+        result[key] = result.get(key, 0.0) + float(value)
+
+    return result if len(result) > 0 else None
@@ -56,6 +56,19 @@ def is_benchmark_supported(settings, benchmark: Benchmark):
     return benchmark.is_dtmc() or benchmark.is_ctmc() or benchmark.is_mdp()
 
 
+def get_prebuilt_model_format():
+    """ NA """
+    return None
+
+def get_model_build_command(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+def use_prebuilt_model(settings, invocation: Invocation, benchmark: Benchmark, filename):
+    """ NA """
+    return None
+
+
 def get_invocation(settings, benchmark: Benchmark, configuration: Configuration, solver: Solver, precision, export):
     """
     Returns an invocations that invokes the tool for the given benchmark and the given configuration.
@@ -198,6 +211,12 @@ def get_max_bscc_size(execution: Execution):
     """
     return None
 
+def get_timing_info(execution: Execution):
+    """
+    NA
+    """
+    return None
+
 
 def is_not_supported(logfile):
     """
@@ -1,4 +1,5 @@
 import itertools
+import re
 
 from ..benchmark import Benchmark
 from ..invocation import Invocation
@@ -49,6 +50,59 @@ def is_benchmark_supported(settings, benchmark : Benchmark):
     return benchmark.is_dtmc() or benchmark.is_ctmc()
 
 
+def get_model_arguments(settings, benchmark : Benchmark):
+    """ Returns the arguments with which storm builds the model of the given benchmark (without the property). """
+    bdir = benchmark.get_directory()
+    if (benchmark.is_prism()):
+        benchmark_arguments = "--prism {}".format(os.path.join(bdir, benchmark.get_prism_filename()))
+        if benchmark.get_open_parameter_def_string() != "":
+            benchmark_arguments += " --constants {}".format(benchmark.get_open_parameter_def_string())
+        if benchmark.is_ctmc():
+            benchmark_arguments += " --prismcompat"
+    else:
+        # For, e.g., PGCL, GreatSPN benchmarks we use the .jani files
+        janifile = benchmark.get_jani_filename()
+        par_defs = benchmark.get_open_parameter_def_string()
+        benchmark_arguments = "--jani {}".format(os.path.join(bdir, janifile))
+        if par_defs != "":
+            benchmark_arguments += " --constants " + par_defs
+    return benchmark_arguments
+
+
+def get_prebuilt_model_format():
+    """ return the format of prebuilt (explicit) models or None if the tool can not load prebuilt models"""
+    return ".drn"
+
+
+def get_model_build_command(settings, invocation : Invocation, benchmark : Benchmark, filename):
+    """
+    Returns the command that builds the model of the given benchmark for the given invocation and exports it to the given
+    (.drn) file. The model is built by the same storm binary (or container) as in the command of the invocation.
+    Returns None if the model can not be prebuilt. This is the case for benchmarks with a property file, since
+    the properties might refer to variables of the model which are not present in the explicit model, and for invocations
+    using exact arithmetic, since the exported model only contains floating point numbers.
+    """
+    if not is_benchmark_supported(settings, benchmark) or benchmark.property is not None:
+        return None
+    benchmark_arguments = " " + get_model_arguments(settings, benchmark) + " "
+    command = invocation.command + " "
+    if "--exact" in command.split() or benchmark_arguments not in command:
+        return None
+    # --buildfull keeps all labels and reward models
+    return "{}{}--buildfull --exportbuild {}".format(command[:command.index(benchmark_arguments)], benchmark_arguments, filename)
+
+
+def use_prebuilt_model(settings, invocation : Invocation, benchmark : Benchmark, filename):
+    """
+    Returns the command of the given invocation where the model is loaded from the given prebuilt model file
+    instead of being built from the model description, or None if this is not possible (see get_model_build_command).
+    """
+    if get_model_build_command(settings, invocation, benchmark, filename) is None:
+        return None
+    benchmark_arguments = " " + get_model_arguments(settings, benchmark) + " "
+    return (invocation.command + " ").replace(benchmark_arguments, " --explicit-drn {} ".format(filename), 1).rstrip()
+
+
 def get_invocation(settings, benchmark : Benchmark, configuration : Configuration, solver : Solver, precision, export):
     """
     Returns an invocations that invokes the tool for the given benchmark and the given prism configuration.
@@ -70,20 +124,9 @@ def get_invocation(settings, benchmark : Benchmark, configuration : Configuratio
         bdir = benchmark.get_directory()
 
         storm_executable = settings.tool_executable("storm") + " --statistics"
-        if (benchmark.is_prism()):
-            benchmark_arguments = "--prism {}".format(os.path.join(bdir, benchmark.get_prism_filename()))
-            if benchmark.get_open_parameter_def_string() != "":
-                benchmark_arguments += " --constants {}".format(benchmark.get_open_parameter_def_string())
-            if benchmark.is_ctmc():
-                benchmark_arguments += " --prismcompat"
-                invocation.note += " Use `--prismcompat` to ensure compatibility with prism benchmark."
-        else:
-            # For, e.g., PGCL, GreatSPN benchmarks we use the .jani files
-            janifile = benchmark.get_jani_filename()
-            par_defs = benchmark.get_open_parameter_def_string()
-            benchmark_arguments = "--jani {}".format(os.path.join(bdir, janifile))
-            if par_defs != "":
-                benchmark_arguments += " --constants " + par_defs
+        benchmark_arguments = get_model_arguments(settings, benchmark)
+        if benchmark.is_prism() and benchmark.is_ctmc():
+            invocation.note += " Use `--prismcompat` to ensure compatibility with prism benchmark."
 
         if benchmark.property is not None:
             benchmark_arguments += " --prop {}".format(os.path.join(bdir, benchmark.property))
@@ -417,3 +460,28 @@ def get_max_scc_chain_length(execution : Execution):
     return max_scc_chain_length
 
 
+def get_timing_info(execution : Execution):
+    """
+    Returns the timing and memory information that storm prints due to --timemem as a dict (or None if there is none):
+        * '<phase>-time' for each 'Time for <phase>: <t>s.' line, e.g. 'model-input-parsing-time', 'model-construction-time'
+          and 'model-checking-time' (times of phases that occur multiple times, e.g. for multiple properties, are summed up)
+        * 'tool-peak-memory' (in MiB), 'tool-cpu-time' and 'tool-total-time' from the performance statistics.
+    Times are in seconds.
+    """
+    log = execution.concatenate_logs()
+
+    result = OrderedDict()
+    for phase, value in re.findall(r"^Time for ([^:\n]+): ([0-9.eE+-]+)s\.$", log, re.MULTILINE):
+        key = phase.strip().lower().replace(" ", "-") + "-time"
+        result[key] = result.get(key, 0.0) + float(value)
+    match = re.search(r"peak memory usage: ([0-9.]+) ?([KMG]?B)", log)
+    if match is not None:
+        result["tool-peak-memory"] = float(match.group(1)) * {"B": 1.0 / (1024 * 1024), "KB": 1.0 / 1024, "MB": 1.0, "GB": 1024.0}[match.group(2)]
+    match = re.search(r"CPU time: ([0-9.]+)s", log)
+    if match is not None:
+        result["tool-cpu-time"] = float(match.group(1))
+    match = re.search(r"wallclock time: ([0-9.]+)s", log)
+    if match is not None:
+        result["tool-total-time"] = float(match.group(1))
+
+    return result if len(result) > 0 else None
@@ -5,6 +5,7 @@ import math
 import csv
 import json
 import shutil
+import tempfile
 from decimal import *
 from fractions import *
 from collections import OrderedDict
@@ -24,11 +25,43 @@ def load_json(path: str):
 
 
 def save_json(json_data, path: str):
-    path = set_artifact_dir(path)
-    with open(path, 'w') as json_file:
+    with open_atomic(path) as json_file:
         json.dump(json_data, json_file, ensure_ascii=False, indent='\t')
 
 
+# mkstemp creates files that are only readable by the owner, we want the permissions of a regular open() instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class open_atomic(object):
+    """
+    Opens a temporary file for writing that replaces the file at the given path once it is closed.
+    Readers (and concurrent workers) therefore never see partially written files.
+    """
+
+    def __init__(self, path: str, encoding=None, binary=False):
+        self.path = set_artifact_dir(path)
+        self.encoding = encoding
+        self.binary = binary
+        self.file = None
+
+    def __enter__(self):
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                             prefix="." + os.path.basename(self.path) + ".", suffix=".tmp")
+        os.chmod(self.tmp_path, 0o666 & ~_UMASK)
+        self.file = os.fdopen(fd, 'wb' if self.binary else 'w', encoding=self.encoding)
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+        return False
+
+
 def load_csv(path: str, delim='\t'):
     path = set_artifact_dir(path)
     with open(path, 'r') as csv_file:
@@ -44,8 +77,8 @@ def save_csv(csv_data, path: str, delim=';'):
 
 def ensure_directory(path: str):
     path = set_artifact_dir(path)
-    if not os.path.exists(path):
-        os.makedirs(path)
+    # parallel processes (e.g. shards of a SLURM array) might create the directory at the same time
+    os.makedirs(path, exist_ok=True)
 
 
 def is_valid_filename(name: str, invalid_chars=None):
@@ -64,6 +97,20 @@ def is_valid_filename(name: str, invalid_chars=None):
     return True
 
 
+# longest file name that is allowed on common file systems (in bytes)
+MAX_FILENAME_LENGTH = 255
+
+
+def is_valid_filename_component(name: str, suffix_length=0):
+    """
+    Returns true if the given name can be used as a file name (followed by a suffix of the given length) within a directory.
+    Unlike is_valid_filename, this only checks the string and does not touch the file system.
+    """
+    if name in ["", ".", ".."] or "/" in name or "\0" in name:
+        return False
+    return len(name.encode("utf-8")) + suffix_length <= MAX_FILENAME_LENGTH
+
+
 def remove_directory_contents(directory, exluded=[]):
     directory = set_artifact_dir(directory)
     for name in os.listdir(directory):
@@ -175,6 +222,9 @@ class Progressbar(object):
 
     def print_progress(self, value):
         now = time.time()
+        if not sys.stdout.isatty() and value != self.max_value:
+            # carriage returns would end up in a single giant line in (e.g. SLURM) output files
+            return False
         if now - self.last_time_printed >= self.delay or value == self.max_value or value == 0:
             if (self.max_value == 0):
                 progress = self.width
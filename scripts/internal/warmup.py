@@ -0,0 +1,79 @@
+from .utility import *
+from .execution import CommandExecution
+from .fingerprint import get_tool_files, get_model_files
+import threading
+
+# Strategies for warming up before an invocation is measured:
+#   none:     no warm-up at all
+#   prime:    load the model files, the tool binary and the container image into the page cache
+#   per-tool: prime and additionally run the tool once (5 seconds) per tool binary and batch
+#   run:      run each invocation for 5 seconds before the actual execution (the previous behavior)
+WARM_UP_STRATEGIES = ["none", "prime", "per-tool", "run"]
+WARM_UP_TIME_LIMIT = 5
+
+
+def prime_file(path):
+    """
+    Loads the given file into the page cache. Returns false if it does not exist.
+    The kernel is asked to read ahead the whole file, reading it afterwards makes sure that the i/o has finished.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        while len(os.read(fd, 4 * 1024 * 1024)) > 0:
+            pass
+    finally:
+        os.close(fd)
+    return True
+
+
+class WarmUp(object):
+    """
+    Prepares the execution of invocations according to the given warm-up strategy (see WARM_UP_STRATEGIES).
+    An instance is shared by all workers of a batch.
+    """
+
+    def __init__(self, settings, strategy="prime"):
+        if strategy not in WARM_UP_STRATEGIES:
+            raise AssertionError("Unknown warm-up strategy '{}'.".format(strategy))
+        self.settings = settings
+        self.strategy = strategy
+        self.lock = threading.Lock()
+        self.primed_tool_files = set()  # the tool files do not change within a batch, so they are primed only once
+        self.warmed_up_tools = set()
+
+    def is_warm_up_run(self):
+        """ Returns true if each invocation is preceded by a warm-up run of itself (strategy 'run'). """
+        return self.strategy == "run"
+
+    def prepare(self, invocation, cpus=None):
+        """ Warms up for the given invocation. Called by the worker before the invocation is executed. """
+        if self.strategy in ["none", "run"]:
+            return
+        command = set_artifact_dir(invocation.command)
+        tool_files = [set_artifact_dir(f) for f in get_tool_files(invocation.command)]
+        # the image of a container instance (see ContainerInstances) was loaded when the instance was started,
+        # but each instance is warmed up separately
+        instances = [token for token in command.split() if token.startswith("instance://")]
+        with self.lock:
+            new_tool_files = [f for f in tool_files if f not in self.primed_tool_files]
+            self.primed_tool_files.update(new_tool_files)
+            tool_key = tuple(tool_files + instances)
+            warm_up_tool = self.strategy == "per-tool" and tool_key not in self.warmed_up_tools
+            self.warmed_up_tools.add(tool_key)
+        for filename in new_tool_files:
+            prime_file(filename)
+        try:
+            model_files = get_model_files(self.settings, invocation.benchmark_id)
+        except LookupError:
+            model_files = []
+        for filename in model_files:
+            prime_file(set_artifact_dir(filename))
+        if warm_up_tool:
+            # starts the JVM / container once, the results are discarded
+            dryrun = CommandExecution()
+            dryrun.run(command, WARM_UP_TIME_LIMIT, cpus)
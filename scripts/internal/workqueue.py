@@ -0,0 +1,214 @@
+from .utility import *
+from .invocation import Invocation
+import fcntl, threading
+
+HEARTBEAT_INTERVAL = 30  # seconds between two heartbeats of a claimed item
+HEARTBEAT_TIMEOUT = 300  # claimed items without a heartbeat for this long are reclaimed
+
+
+class WorkItem(object):
+    """ An invocation that has been claimed from the queue. """
+
+    def __init__(self, index, filename, invocation):
+        self.index = index
+        self.filename = filename
+        self.invocation = invocation
+
+
+class WorkQueue(object):
+    """
+    A queue of invocations in the (shared) results directory from which any number of processes on any number of nodes
+    claim invocations. Each item is a json file that is moved between the sub-directories
+        * pending: waiting to be executed. The file name starts with a sequence number that determines the order.
+        * claimed: being executed by a worker, which regularly updates the modification time of the file (heartbeat).
+                   Items whose worker did not send a heartbeat within HEARTBEAT_TIMEOUT seconds are moved back to pending.
+        * done:    executed (successfully or not, see the journal for the status).
+    Each item stores the time and memory limit and the method for enforcing the memory limit with which the invocation was
+    added. Workers use these instead of their own options, so all results of the queue are obtained under the same limits.
+    All modifications happen while holding an exclusive lock on the file 'lock'. Moving files via rename is atomic,
+    so an item is never claimed twice. As clocks of different nodes might differ, the age of a heartbeat is compared
+    to the modification time of the lock file, which is set by the file system whenever the lock is acquired.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.directory = set_artifact_dir(os.path.join(settings.results_dir(), "queue"))
+        self.pending_dir = os.path.join(self.directory, "pending")
+        self.claimed_dir = os.path.join(self.directory, "claimed")
+        self.done_dir = os.path.join(self.directory, "done")
+        for directory in [self.pending_dir, self.claimed_dir, self.done_dir]:
+            ensure_directory(directory)
+        self.lock_path = os.path.join(self.directory, "lock")
+        self.claims = dict()  # file name -> (item, event that stops its heartbeat) for the items claimed by this process
+        self.claims_lock = threading.Lock()
+
+    def _locked(self):
+        return _QueueLock(self.lock_path)
+
+    @staticmethod
+    def _split_filename(filename):
+        """ Returns the sequence number and the invocation identifier of the given item file name. """
+        index, identifier = filename[:-len(".json")].split("-", 1)
+        return int(index), identifier
+
+    def _items(self, directory):
+        return sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+
+    @staticmethod
+    def _get_item_json(invocation, memory_limit_method):
+        item_json = invocation.to_json()
+        item_json["memory-limit"] = invocation.memory_limit
+        item_json["memory-limit-method"] = memory_limit_method if invocation.memory_limit is not None else None
+        return item_json
+
+    def add(self, invocations, memory_limit_method=None):
+        """
+        Adds the given invocations to the queue together with their limits and the method for enforcing memory limits.
+        Invocations that are already pending or claimed are not added again (and keep their limits), finished ones are
+        queued again. Returns the number of added invocations.
+        """
+        with self._locked() as lock:
+            self.reclaim_expired(lock.now)
+            pending = self._items(self.pending_dir)
+            claimed = self._items(self.claimed_dir)
+            done = self._items(self.done_dir)
+            queued = dict((self._split_filename(f)[1], os.path.join(self.pending_dir, f)) for f in pending)
+            queued.update((self._split_filename(f)[1], os.path.join(self.claimed_dir, f)) for f in claimed)
+            finished = dict((self._split_filename(f)[1], f) for f in done)
+            next_index = max([self._split_filename(f)[0] for f in pending + claimed + done] + [-1]) + 1
+            num_added = 0
+            mismatches = []
+            for invocation in invocations:
+                identifier = invocation.get_identifier()
+                item_json = self._get_item_json(invocation, memory_limit_method)
+                if identifier in queued:
+                    try:
+                        queued_json = load_json(queued.pop(identifier))
+                    except (OSError, ValueError):
+                        # claimed or completed in the meantime
+                        continue
+                    if any(queued_json.get(key) != item_json[key] for key in ["time-limit", "memory-limit", "memory-limit-method"]):
+                        mismatches.append(identifier)
+                    continue
+                if identifier in finished:
+                    os.remove(os.path.join(self.done_dir, finished.pop(identifier)))
+                filename = "{:08d}-{}.json".format(next_index, identifier)
+                save_json(item_json, os.path.join(self.pending_dir, filename))
+                next_index += 1
+                num_added += 1
+            if len(mismatches) > 0:
+                print("WARN: {} invocations (e.g. {}) are already queued with different limits, they are executed with the "
+                      "limits of the queue.".format(len(mismatches), mismatches[0]))
+            return num_added
+
+    def reclaim_expired(self, now):
+        """ Moves claimed items whose heartbeat is older than HEARTBEAT_TIMEOUT back to pending. Call while locked. """
+        num_reclaimed = 0
+        for filename in self._items(self.claimed_dir):
+            try:
+                age = now - os.stat(os.path.join(self.claimed_dir, filename)).st_mtime
+            except OSError:
+                continue
+            if age > HEARTBEAT_TIMEOUT:
+                os.rename(os.path.join(self.claimed_dir, filename), os.path.join(self.pending_dir, filename))
+                print("\nReclaimed invocation {} whose worker did not respond for {:.0f} seconds.".format(
+                    self._split_filename(filename)[1], age))
+                num_reclaimed += 1
+        return num_reclaimed
+
+    def claim(self):
+        """ Claims the next pending invocation and returns a WorkItem or None if there are no pending invocations. """
+        with self._locked() as lock:
+            self.reclaim_expired(lock.now)
+            for filename in self._items(self.pending_dir):
+                claimed_path = os.path.join(self.claimed_dir, filename)
+                try:
+                    os.rename(os.path.join(self.pending_dir, filename), claimed_path)
+                except OSError:
+                    continue
+                # the modification time is not changed by the rename
+                os.utime(claimed_path)
+                index = self._split_filename(filename)[0]
+                item_json = load_json(claimed_path)
+                item = WorkItem(index, filename, Invocation(item_json))
+                item.invocation.memory_limit_method = item_json.get("memory-limit-method")
+                if item.invocation.memory_limit is not None and item.invocation.memory_limit_method is None:
+                    # items of older queues
+                    item.invocation.memory_limit_method = "auto"
+                self._start_heartbeat(item)
+                return item
+        return None
+
+    def _start_heartbeat(self, item):
+        stop = threading.Event()
+        with self.claims_lock:
+            self.claims[item.filename] = (item, stop)
+        path = os.path.join(self.claimed_dir, item.filename)
+
+        def beat():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    os.utime(path)
+                except OSError:
+                    # the item got reclaimed by another worker
+                    return
+
+        threading.Thread(target=beat, daemon=True).start()
+
+    def _stop_heartbeat(self, item):
+        with self.claims_lock:
+            claim = self.claims.pop(item.filename, None)
+        if claim is not None:
+            claim[1].set()
+        return claim is not None
+
+    def _move_claimed(self, item, directory):
+        if not self._stop_heartbeat(item):
+            # already completed or released
+            return
+        with self._locked():
+            try:
+                os.rename(os.path.join(self.claimed_dir, item.filename), os.path.join(directory, item.filename))
+            except OSError:
+                print("\nWARN: Invocation {} was reclaimed by another worker while being executed.".format(
+                    item.invocation.get_identifier()))
+
+    def complete(self, item):
+        """ Marks the claimed item as done. """
+        self._move_claimed(item, self.done_dir)
+
+    def release(self, item):
+        """ Puts the claimed item back so that it can be claimed again (e.g. if this worker got interrupted). """
+        self._move_claimed(item, self.pending_dir)
+
+    def release_all(self):
+        """ Releases all items claimed by this process. """
+        with self.claims_lock:
+            items = [item for item, stop in self.claims.values()]
+        for item in items:
+            self.release(item)
+
+    def get_counts(self):
+        """ Returns the number of pending, claimed and done items. """
+        return len(self._items(self.pending_dir)), len(self._items(self.claimed_dir)), len(self._items(self.done_dir))
+
+
+class _QueueLock(object):
+    """ Exclusive lock on the given file (via flock). Provides the current time of the file system as 'now'. """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.now = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        os.utime(self.path)
+        self.now = os.stat(self.path).st_mtime
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+        return False
@@ -0,0 +1,35 @@
+import argparse
+from internal.settings import *
+from internal.invocationstore import *
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts invocation files between json arrays (.json) and invocation stores (.jsonl), "
+                                                 "i.e. files with one invocation per line and an index ('<file>.idx') via which run.py "
+                                                 "reads single invocations (-i) and shards (--shard) without loading the whole file. "
+                                                 "Usage: 'python3 invocations.py convert plan.json plan.jsonl'")
+    parser.add_argument('command', choices=["convert", "index"],
+                        help="'convert' converts the input file into the output file (the formats are given by the file extensions), "
+                             "'index' (re-)creates the index of an invocation store.")
+    parser.add_argument('input', help="The invocations file that is converted or indexed.")
+    parser.add_argument('output', nargs='?', help="Only has an effect for 'convert'. The converted invocations file.")
+    args = parser.parse_args()
+
+    # the task and the results directory are irrelevant for the estimated costs in the index
+    settings = Settings("stationary", "results")
+    if not os.path.isfile(set_artifact_dir(args.input)):
+        raise AssertionError("Invocations file {} does not exist".format(args.input))
+    if args.command == "index":
+        if not is_invocation_store(args.input):
+            raise AssertionError("Only invocation stores (.jsonl) have an index.")
+        num_invocations = build_index(settings, args.input)
+        print("Created the index of {} invocations '{}'.".format(num_invocations, get_index_path(args.input)))
+    else:
+        if args.output is None:
+            raise AssertionError("The output file is required for 'convert'.")
+        invocations_json = load_invocations_json(args.input)
+        if is_invocation_store(args.output):
+            save_invocation_store(settings, invocations_json, args.output)
+        else:
+            save_json(invocations_json, args.output)
+        print("Converted {} invocations from '{}' to '{}'.".format(len(invocations_json), args.input, args.output))
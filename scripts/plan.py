@@ -0,0 +1,160 @@
+import argparse
+import glob
+from internal.invocation import *
+from internal.settings import *
+from internal.sharding import *
+from internal.prediction import *
+from internal.events import format_duration
+
+
+def merge_invocation_files(invocation_files):
+    """
+    Merges the invocations of the given files (pairs of filename and invocations) into a single list in which each
+    invocation identifier occurs only once (the first occurrence is kept).
+    Returns the merged invocations and a report (as json) of the overlaps between the files:
+        * files:     for each file, the number of invocations, duplicates within the file, invocations that also occur in
+                     other files and invocations that only occur in this file
+        * overlaps:  for each pair of files, the number of shared invocation identifiers
+        * conflicts: identifiers that occur with different commands, time limits or memory limits (the first one is kept)
+        * same-command: groups of different identifiers with the same command (and limits), i.e., probably the same execution
+    """
+    merged = OrderedDict()  # identifier -> invocation
+    occurrences = OrderedDict()  # identifier -> list of filenames
+    conflicts = OrderedDict()
+    for filename, invocations in invocation_files:
+        for invocation in invocations:
+            identifier = invocation.get_identifier()
+            occurrences.setdefault(identifier, []).append(filename)
+            if identifier not in merged:
+                merged[identifier] = invocation
+                continue
+            first = merged[identifier]
+            if (first.command, first.time_limit, first.memory_limit) != (invocation.command, invocation.time_limit, invocation.memory_limit):
+                conflicts.setdefault(identifier, [occurrences[identifier][0]]).append(filename)
+
+    files_json = OrderedDict()
+    overlaps = OrderedDict()
+    for filename, invocations in invocation_files:
+        identifiers = [invocation.get_identifier() for invocation in invocations]
+        shared = [identifier for identifier in set(identifiers) if len(set(occurrences[identifier])) > 1]
+        files_json[filename] = OrderedDict([("invocations", len(identifiers)),
+                                            ("duplicates-within-file", len(identifiers) - len(set(identifiers))),
+                                            ("shared-with-other-files", len(shared)),
+                                            ("unique", len(set(identifiers)) - len(shared))])
+    for i, (filename, invocations) in enumerate(invocation_files):
+        identifiers = set(invocation.get_identifier() for invocation in invocations)
+        for other_filename, other_invocations in invocation_files[i + 1:]:
+            num_shared = len(identifiers & set(invocation.get_identifier() for invocation in other_invocations))
+            if num_shared > 0:
+                overlaps["{} & {}".format(filename, other_filename)] = num_shared
+
+    commands = OrderedDict()  # (command, limits) -> identifiers
+    for identifier, invocation in merged.items():
+        commands.setdefault((invocation.command, invocation.time_limit, invocation.memory_limit), []).append(identifier)
+
+    report = OrderedDict()
+    report["num-invocations"] = sum(len(invocations) for _, invocations in invocation_files)
+    report["num-unique-invocations"] = len(merged)
+    report["files"] = files_json
+    report["overlaps"] = overlaps
+    report["conflicts"] = OrderedDict((identifier, filenames) for identifier, filenames in conflicts.items())
+    report["same-command"] = [identifiers for identifiers in commands.values() if len(identifiers) > 1]
+    return list(merged.values()), report
+
+
+def print_report(report, duplicate_cost):
+    print("Loaded {} invocations from {} files, {} of them are unique.".format(
+        report["num-invocations"], len(report["files"]), report["num-unique-invocations"]))
+    if duplicate_cost > 0:
+        print("The duplicates would take about {} of (predicted) runtime.".format(format_duration(duplicate_cost)))
+    longest_name = max([len(os.path.basename(filename)) for filename in report["files"]] + [4])
+    print("\n{}  {:>11} {:>10} {:>8} {:>8}".format("File".ljust(longest_name), "invocations", "duplicates", "shared", "unique"))
+    for filename, entry in report["files"].items():
+        print("{}  {:>11} {:>10} {:>8} {:>8}".format(os.path.basename(filename).ljust(longest_name), entry["invocations"],
+                                                    entry["duplicates-within-file"], entry["shared-with-other-files"], entry["unique"]))
+    if len(report["overlaps"]) > 0:
+        print("\nOverlapping files:")
+        for files, num_shared in sorted(report["overlaps"].items(), key=lambda item: -item[1]):
+            print("\t{:>6} shared invocations: {}".format(num_shared, " & ".join(os.path.basename(f) for f in files.split(" & "))))
+    if len(report["conflicts"]) > 0:
+        print("\nWARN: {} invocation identifiers occur with different commands or limits (the first occurrence is kept):".format(
+            len(report["conflicts"])))
+        conflicting_files = OrderedDict()  # filenames -> identifiers
+        for identifier, filenames in report["conflicts"].items():
+            conflicting_files.setdefault(", ".join(os.path.basename(f) for f in filenames), []).append(identifier)
+        for filenames, identifiers in conflicting_files.items():
+            print("\t{:>6} in {}, e.g. {}".format(len(identifiers), filenames, identifiers[0]))
+    if len(report["same-command"]) > 0:
+        print("\nWARN: {} groups of invocations with different identifiers have the same command and limits:".format(
+            len(report["same-command"])))
+        for identifiers in report["same-command"]:
+            print("\t" + ", ".join(identifiers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merges invocation files into a single plan without duplicate invocations, "
+                                                 "reports the overlaps between the files and splits the plan into execution units "
+                                                 "with balanced (predicted) runtimes. "
+                                                 "Usage: 'python3 plan.py -t <task> -o plan.json [-n <units>] [files]'")
+    parser.add_argument('-t', '--task',
+                        help="Choose a task from 'evts' and 'stationary'.", required=True)
+    parser.add_argument('files', nargs='*',
+                        help="The invocation files that are merged. Per default, all invocation files (*.json) of the directory "
+                             "given via [-d, --directory] are merged.")
+    parser.add_argument('-d', '--directory', default="$ARTIFACT_DIR/Evaluation",
+                        help="Only has an effect if no files are given. The directory containing the invocation files. "
+                             "Usage: -d path/to/directory", required=False)
+    parser.add_argument('-r', '--results_dir',
+                        help="A result directory whose results are used for predicting the runtimes (see run.py). "
+                             "Usage: -r path/to/result/... ", required=False)
+    parser.add_argument('-o', '--output', default="plan.json",
+                        help="The merged invocation file (executable via 'run.py -f'). A report of the overlaps is saved next to it "
+                             "('<output>.report.json'). Usage: -o <filename>", required=False)
+    parser.add_argument('-n', '--units', type=int, default=1,
+                        help="Number of execution units. If larger than 1, the plan is additionally split into the invocation files "
+                             "'<output>-<k>.json' (1 <= k <= n) with balanced predicted runtimes. Usage: -n <units>", required=False)
+    args = parser.parse_args()
+    task = str(args.task)
+    if task not in ["evts", "stationary"]:
+        raise AssertionError("The task argument has to be set to 'evts' or 'stationary'.")
+    if args.units < 1:
+        raise AssertionError("The number of units has to be at least 1.")
+
+    output_stem = os.path.splitext(args.output)[0]
+    if len(args.files) > 0:
+        filenames = args.files
+    else:
+        directory = set_artifact_dir(args.directory)
+        filenames = sorted(glob.glob(os.path.join(directory, "*.json")))
+    # do not merge the output of a previous planning
+    outputs = [os.path.realpath(set_artifact_dir(f)) for f in [args.output, output_stem + ".report.json"]]
+    filenames = [f for f in filenames if os.path.realpath(set_artifact_dir(f)) not in outputs and
+                 not os.path.realpath(set_artifact_dir(f)).startswith(os.path.realpath(set_artifact_dir(output_stem)) + "-")]
+    invocation_files = load_invocation_files(filenames)
+    if len(invocation_files) == 0:
+        raise AssertionError("No invocation files found.")
+
+    invocations, report = merge_invocation_files(invocation_files)
+    settings = Settings(task, args.results_dir if args.results_dir is not None else "results")
+    predictor = RuntimePredictor(settings)
+    if args.results_dir is not None and predictor.train() > 0:
+        print("Predicting runtimes with a model trained on {} results.".format(predictor.num_samples))
+    predicted_times = dict((invocation.get_identifier(), predictor.predict(invocation)) for invocation in invocations)
+    duplicate_cost = sum(predicted_times[invocation.get_identifier()] for _, file_invocations in invocation_files
+                         for invocation in file_invocations) - sum(predicted_times.values())
+    report["predicted-duplicate-time"] = duplicate_cost
+    print_report(report, duplicate_cost)
+
+    save_json([invocation.to_json() for invocation in invocations], args.output)
+    save_json(report, output_stem + ".report.json")
+    print("\nSaved the plan with {} invocations (predicted runtime {}) to '{}'.".format(
+        len(invocations), format_duration(sum(predicted_times.values())), args.output))
+    if args.units > 1:
+        costs = [predicted_times[invocation.get_identifier()] for invocation in invocations]
+        for k, indices in enumerate(partition(costs, args.units), start=1):
+            unit_filename = "{}-{}.json".format(output_stem, k)
+            save_json([invocations[i].to_json() for i in indices], unit_filename)
+            print("\tUnit {}: {} invocations (predicted runtime {}) saved to '{}'".format(
+                k, len(indices), format_duration(sum(costs[i] for i in indices)), unit_filename))
+    print("Execute it via\n\tpython3 {} -t {} -r <results> -f {}".format(
+        os.path.join(os.path.relpath(sys.path[0]), "run.py"), task, args.output if args.units == 1 else output_stem + "-<k>.json"))
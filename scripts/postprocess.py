@@ -1,6 +1,8 @@
 import argparse
 from internal.export import *
 from internal.settings import *
+from internal.profiling import *
+from internal import export
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Storm benchmarking tool. "
@@ -18,6 +20,10 @@ if __name__ == "__main__":
     parser.add_argument('-l', '--time_limit',
                         help='The maximum value for runtime.  '
                              'Usage: -l <number> ', required=True)
+    parser.add_argument('--profile', action='store_true',
+                        help="Records the time spent in each stage of the postprocessing and in each function of the export module and "
+                             "the tool adapters and saves a report to 'profile-postprocess.json' in the results directory.",
+                        required=False)
 
     args = parser.parse_args()
 
@@ -28,6 +34,11 @@ if __name__ == "__main__":
 
     settings = Settings(task, args.results_dir)
     settings.test_result_dirs()
+    if args.profile:
+        profiler.enable()
+        # only calls within the export module (e.g. to create_log_page) are recorded, the stages below cover the rest
+        for module in [export, greatspn, sds, storm, prism]:
+            profiler.instrument(module)
 
 
 
@@ -43,29 +54,30 @@ if __name__ == "__main__":
 
    
 
-    for res_json in [load_json(os.path.join(logdir, f)) for f in os.listdir(logdir) if
-                     f.endswith(".json") and os.path.isfile(set_artifact_dir(os.path.join(logdir, f)))]:
-        tool = res_json["tool"]
-        config = res_json["configuration-id"]
-        solver = res_json["solver-id"]
-        precision = res_json["precision"]
-        benchmark = res_json["benchmark-id"]
-
-        exec_data.setdefault(tool, OrderedDict())
-        exec_data[tool].setdefault(config, OrderedDict())
-        exec_data[tool][config].setdefault(solver, OrderedDict())
-        exec_data[tool][config][solver].setdefault(precision, OrderedDict())
-
-        if benchmark in exec_data[tool][config][solver][precision]:
-            print("Error: Multiple result files found for {}.{}.{}.{}.{}".format(tool, config, solver, precision,
-                                                                                 benchmark))
-        res_json["log"] = os.path.join(logdir, res_json["log"])
-        exec_data[tool][config][solver][precision][benchmark] = res_json
-        if not benchmark in benchmark_ids:
-            benchmark_ids.append(benchmark)
-        tools_configs_solvers_precisions.setdefault((tool, config, solver, precision), 0)
-        if not is_not_supported(res_json):
-            tools_configs_solvers_precisions[(tool, config, solver, precision)] += 1
+    with profiler.stage("load-results"):
+        for res_json in [load_json(os.path.join(logdir, f)) for f in os.listdir(logdir) if
+                         f.endswith(".json") and os.path.isfile(set_artifact_dir(os.path.join(logdir, f)))]:
+            tool = res_json["tool"]
+            config = res_json["configuration-id"]
+            solver = res_json["solver-id"]
+            precision = res_json["precision"]
+            benchmark = res_json["benchmark-id"]
+
+            exec_data.setdefault(tool, OrderedDict())
+            exec_data[tool].setdefault(config, OrderedDict())
+            exec_data[tool][config].setdefault(solver, OrderedDict())
+            exec_data[tool][config][solver].setdefault(precision, OrderedDict())
+
+            if benchmark in exec_data[tool][config][solver][precision]:
+                print("Error: Multiple result files found for {}.{}.{}.{}.{}".format(tool, config, solver, precision,
+                                                                                     benchmark))
+            res_json["log"] = os.path.join(logdir, res_json["log"])
+            exec_data[tool][config][solver][precision][benchmark] = res_json
+            if not benchmark in benchmark_ids:
+                benchmark_ids.append(benchmark)
+            tools_configs_solvers_precisions.setdefault((tool, config, solver, precision), 0)
+            if not is_not_supported(res_json):
+                tools_configs_solvers_precisions[(tool, config, solver, precision)] += 1
 
     benchmark_ids.sort()
     print("Found Data for {} benchmarks and {} tool-config-solver-precision combinations".format(len(benchmark_ids),
@@ -83,8 +95,9 @@ if __name__ == "__main__":
     additional_info_keys = ["states"]
     print("Gather the following additional benchmark info: {}".format(additional_info_keys))
 
-    benchmark_infos = gather_benchmark_info(exec_data, additional_info_keys, benchmark_ids,
-                                            tools_configs_solvers_precisions)
+    with profiler.stage("benchmark-info"):
+        benchmark_infos = gather_benchmark_info(exec_data, additional_info_keys, benchmark_ids,
+                                                tools_configs_solvers_precisions)
 
     print("Comparison of runtimes...")
 
@@ -96,21 +109,25 @@ if __name__ == "__main__":
     print("Generating file {} and {} for runtime scatter plots".format(
         os.path.join(settings.results_dir_logs(), value_key + "-scatter.csv"),
         os.path.join(settings.results_dir_logs(), value_key + "-texpgf-scatter.csv")))
-    generate_scatter_tex_csv(settings, exec_data, additional_info_keys, benchmark_infos,
-                             tools_configs_solvers_precision_sorted,
-                             settings.results_dir_plots(), value_key, MIN_VALUE_local=1, MAX_VALUE_local=time_limit,
-                             TO_VALUE_local=6000, NA_VALUE_local=6000)
+    with profiler.stage("scatter-plots"):
+        generate_scatter_tex_csv(settings, exec_data, additional_info_keys, benchmark_infos,
+                                 tools_configs_solvers_precision_sorted,
+                                 settings.results_dir_plots(), value_key, MIN_VALUE_local=1, MAX_VALUE_local=time_limit,
+                                 TO_VALUE_local=6000, NA_VALUE_local=6000)
     print("Generating file {} for quantile plots".format(
         os.path.join(settings.results_dir_plots(), value_key + "-quantile.csv")))
-    generate_quantile_csv(settings, exec_data, benchmark_ids, tools_configs_solvers_precision_sorted,
-                          settings.results_dir_plots(), value_key, MIN_VALUE_local=1, MAX_VALUE_local=time_limit, only_prism=(task=="stationary"))
+    with profiler.stage("quantile-plots"):
+        generate_quantile_csv(settings, exec_data, benchmark_ids, tools_configs_solvers_precision_sorted,
+                              settings.results_dir_plots(), value_key, MIN_VALUE_local=1, MAX_VALUE_local=time_limit, only_prism=(task=="stationary"))
     print("Generating interactive html tables for runtimes in directory {}".format(settings.results_dir_tables()))
-    generate_table(settings, exec_data, additional_info_keys, benchmark_infos, tools_configs_solvers_precision_sorted,
-                   settings.results_dir_tables(), value_key, overwrite_logs=True)
+    with profiler.stage("tables"):
+        generate_table(settings, exec_data, additional_info_keys, benchmark_infos, tools_configs_solvers_precision_sorted,
+                       settings.results_dir_tables(), value_key, overwrite_logs=True)
 
 
     print("-" * 30 + "\nSummary of results:\n")
-    print(generate_summary_table(settings, exec_data, benchmark_ids, tools_configs_solvers_precision_sorted))
+    with profiler.stage("summary"):
+        print(generate_summary_table(settings, exec_data, benchmark_ids, tools_configs_solvers_precision_sorted))
 
 
 
@@ -129,9 +146,10 @@ if __name__ == "__main__":
         print("Baseline via: " + str(tools_configs_solvers_precision_baseline_sorted))
         # get the max norm and mean derivation wrt absolute and relative error. Result saved in key
         # "relative/absolute-error-max-norm-value" and "relative/absolute-error-mean_deviation_value"
-        exec_data = generate_comparison_values(exec_data, benchmark_ids,
-                                               tools_configs_solvers_precision_baseline_sorted,
-                                               tools_configs_solvers_precision_sorted)
+        with profiler.stage("comparison"):
+            exec_data = generate_comparison_values(exec_data, benchmark_ids,
+                                                   tools_configs_solvers_precision_baseline_sorted,
+                                                   tools_configs_solvers_precision_sorted)
 
         print("Generating interactive html table for result comparison (wrt absolute and relative error) in directory {}".format(
                 settings.results_dir_tables()))
@@ -171,3 +189,5 @@ if __name__ == "__main__":
                               settings.results_dir_plots(), value_key, MIN_VALUE_local=1, MAX_VALUE_local=time_limit,
                               incorrect_filter=(inc_difference, 0.001), only_prism=(task=="stationary"))
 
+    if args.profile:
+        profiler.save(os.path.join(settings.results_dir(), "profile-postprocess.json"))
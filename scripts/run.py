@@ -2,6 +2,23 @@ import argparse
 from internal.benchmark import *
 from internal.invocation import *
 from internal.settings import *
+from internal.scheduler import *
+from internal.memory import *
+from internal.limits import *
+from internal.journal import *
+from internal.warmup import *
+from internal.measurement import *
+from internal.sharding import *
+from internal.workqueue import *
+from internal.pruning import *
+from internal.prediction import *
+from internal.events import *
+from internal.profiling import *
+from internal.modelcache import *
+from internal.resultcache import *
+from internal.spec import *
+from internal.invocationstore import *
+from internal.containers import *
 from internal.tools import greatspn, sds, storm, prism
 
 import traceback
@@ -24,18 +41,8 @@ def create_invocations(settings, benchmark_selection):
             print("Time limit should be a number.")
 
     # loading benchmarks for all invocations
-    benchmarks_csv = load_csv(benchmark_selection)
-    benchmarks = OrderedDict([("dtmc", []), ("ctmc", [])])
-    for benchmark_csv in benchmarks_csv:
-        if len(benchmark_csv) > 4:
-            benchmark_id = "{}.property{}.{}".format(benchmark_csv[0], benchmark_csv[4], benchmark_csv[3])
-        elif len(benchmark_csv) == 4:
-            benchmark_id = "{}.{}".format(benchmark_csv[0], benchmark_csv[3])
-        else:
-            benchmark_id = "{}".format(benchmark_csv[0])
-        benchmark = get_benchmark_from_id(settings, benchmark_id)
-        benchmarks[benchmark.get_model_type()].append(benchmark)
-    print("Loaded {} benchmarks from selection '{}'".format(len(benchmarks_csv), benchmark_selection))
+    benchmarks = load_benchmark_selection(settings, benchmark_selection)
+    print("Loaded {} benchmarks from selection '{}'".format(sum(len(b) for b in benchmarks.values()), benchmark_selection))
     # model type selection
     model_types = OrderedDict()
     model_types["dtmc"] = ["Discrete Time Markov Chains", "({} benchmarks)".format(len(benchmarks["dtmc"]))]
@@ -192,153 +199,435 @@ def create_invocations(settings, benchmark_selection):
     return invocations
 
 
-def check_invocations(settings, invocations):
+MAX_PRINTED_PROBLEMS = 20
 
-    invocation_number = 0
-    if len(invocations) > 1:
-        progressbar = Progressbar(len(invocations), "Checking invocations")
-    else:
-        sys.stdout.write("Checking invocation ... ")
-        sys.stdout.flush()
-    invocation_identifiers = set()
-    for invocation in invocations:
-        invocation_number = invocation_number + 1
-        if len(invocations) > 1:
-            progressbar.print_progress(invocation_number)
+
+def check_invocations(settings, invocations):
+    """
+    Checks that the benchmark files of the invocations exist and that their identifiers are unique and can be used as file
+    names. Each distinct benchmark and benchmark file is checked only once and the identifiers are only checked as strings,
+    so that checking does not create files or cause many metadata operations on (shared) file systems.
+    All problems are printed and saved as a report ('check-report.json' in the results directory), which is returned.
+    """
+    problems = []
+
+    def add_problem(index, invocation, problem, message):
         try:
-            # check whether there is no command
-            if invocation.command == "":
+            identifier = invocation.get_identifier()
+        except AssertionError:
+            identifier = None
+        problems.append(OrderedDict([("invocation", index), ("identifier", identifier), ("problem", problem),
+                                     ("message", message)]))
+
+    benchmark_files = OrderedDict()  # benchmark id -> list of files (None if the benchmark is unknown)
+    benchmark_errors = dict()
+    invocation_identifiers = dict()  # identifier -> index of the first invocation with this identifier
+    for index, invocation in enumerate(invocations):
+        # check whether there is no command
+        if invocation.command == "":
+            continue
+        if invocation.benchmark_id not in benchmark_files:
+            try:
+                benchmark = get_benchmark_from_id(settings, invocation.benchmark_id)
+                benchmark_files[invocation.benchmark_id] = [os.path.join(benchmark.get_directory(), filename)
+                                                            for filename in benchmark.get_all_filenames()]
+            except Exception as e:
+                benchmark_files[invocation.benchmark_id] = None
+                benchmark_errors[invocation.benchmark_id] = str(e)
+        if benchmark_files[invocation.benchmark_id] is None:
+            add_problem(index, invocation, "unknown-benchmark", "Unable to find benchmark '{}': {}".format(
+                invocation.benchmark_id, benchmark_errors[invocation.benchmark_id]))
+        try:
+            identifier = invocation.get_identifier()
+        except AssertionError as e:
+            add_problem(index, invocation, "invalid-identifier", str(e))
+            continue
+        # the identifier is used for the log and result files (and the hidden files to which the output is streamed)
+        if not is_valid_filename_component(identifier, len("..stdout")):
+            add_problem(index, invocation, "invalid-identifier",
+                        "Invocation identifier '{}' is not a valid filename.".format(identifier))
+        if identifier in invocation_identifiers:
+            add_problem(index, invocation, "duplicate-identifier", "Invocation identifier '{}' already exists (invocation #{}).".format(
+                identifier, invocation_identifiers[identifier]))
+        else:
+            invocation_identifiers[identifier] = index
+
+    # ensure that the actual benchmark files exist, each file is checked once
+    missing_files = set()
+    for filename in set(f for files in benchmark_files.values() if files is not None for f in files):
+        if not os.path.isfile(set_artifact_dir(filename)):
+            missing_files.add(filename)
+    if len(missing_files) > 0:
+        for index, invocation in enumerate(invocations):
+            if invocation.command == "" or benchmark_files[invocation.benchmark_id] is None:
                 continue
-            benchmark = get_benchmark_from_id(settings, invocation.benchmark_id)
-            # ensure that the actual benchmark files exist
-            for filename in benchmark.get_all_filenames():
-                if not os.path.isfile(set_artifact_dir(os.path.join(benchmark.get_directory(), filename))):
-                    raise AssertionError(
-                        "The file '{}' does not exist.".format(os.path.join(benchmark.get_directory(), filename)))
-            # ensure that the invocation identifier (consisting of benchmark and configuration id) can be a filename and are unique
-            if not is_valid_filename(invocation.get_identifier(), "/"):
-                raise AssertionError(
-                    "Invocation identifier '{}' is either not a valid filename or contains a '.'.".format(
-                        invocation.get_identifier()))
-            if invocation.get_identifier() in invocation_identifiers:
-                raise AssertionError("Invocation identifier '{}' already exists.".format(invocation.get_identifier()))
-            invocation_identifiers.add(invocation.get_identifier())
-        except Exception:
-            print("Error when checking invocation #{}: {}".format(invocation_number - 1, invocation.get_identifier()))
-            traceback.print_exc()
-    print("")
-
-
-def run_invocations(settings, invocations):
-    invocation_number = 0
-    if len(invocations) > 1:
-        progressbar = Progressbar(len(invocations), "Executing invocations")
+            for filename in benchmark_files[invocation.benchmark_id]:
+                if filename in missing_files:
+                    add_problem(index, invocation, "missing-file", "The file '{}' does not exist.".format(filename))
+
+    report = OrderedDict([("invocations", len(invocations)), ("benchmarks", len(benchmark_files)),
+                          ("benchmark-files", sum(len(files) for files in benchmark_files.values() if files is not None)),
+                          ("problems", sorted(problems, key=lambda problem: problem["invocation"]))])
+    save_json(report, os.path.join(settings.results_dir(), "check-report.json"))
+    if len(problems) == 0:
+        print("Checked {} invocations on {} benchmarks: no problems found.".format(len(invocations), len(benchmark_files)))
+    else:
+        print("Checked {} invocations on {} benchmarks: {} problems found (see {}):".format(
+            len(invocations), len(benchmark_files), len(problems), os.path.join(settings.results_dir(), "check-report.json")))
+        for problem in report["problems"][:MAX_PRINTED_PROBLEMS]:
+            print("\tInvocation #{} ({}): {}".format(problem["invocation"], problem["problem"], problem["message"]))
+        if len(problems) > MAX_PRINTED_PROBLEMS:
+            print("\t... and {} more.".format(len(problems) - MAX_PRINTED_PROBLEMS))
+    return report
+
+
+def get_tool(tool_name):
+    """ Returns the module of the tool with the given name. """
+    if tool_name == "storm":
+        return storm
+    elif tool_name == "prism":
+        return prism
+    elif tool_name == "sds":
+        return sds
+    elif tool_name == "greatspn":
+        return greatspn
     else:
-        sys.stdout.write("Executing invocation ... ")
-        sys.stdout.flush()
+        raise AssertionError("Tool '{}' is not allowed.".format(tool_name))
+
+
+def execute_invocation(settings, invocation, cpus=None, memory_limit_method=None, warm_up=None, measurement=None,
+                       predicted_time=None, model_cache=None, container_instances=None, worker_index=0, prediction_source=None):
+    """
+    Executes the given invocation and saves the tool result and the log file in the logs directory.
+    If memory_limit_method is given, the memory limit of the invocation (if any) is enforced using this method.
+    If warm_up is given, it prepares the execution (see WarmUp), otherwise there is a warm-up run of the invocation.
+    If measurement (a RepeatedMeasurement) is given, a successful invocation is repeated until its times are precise enough.
+    The log file only contains the first execution.
+    If predicted_time is given, it is stored next to the actual time (to evaluate the runtime prediction). It should only
+    be given if it was predicted by a trained model. Otherwise, prediction_source (e.g. 'heuristic') can be recorded instead.
+    If model_cache is given, the invocation uses the prebuilt model of its benchmark (if possible, see ModelCache).
+    If container_instances is given, containerized tools are executed in the instance of the given worker (see ContainerInstances).
+    """
+    tool = get_tool(invocation.tool)
+    if model_cache is not None:
+        # as for the export, the command in the .json file is not changed
+        with profiler.stage("model-cache"):
+            invocation.prebuilt_model = model_cache.prepare(tool, invocation)
+    container_instance = None
+    if container_instances is not None:
+        with profiler.stage("container-instance"):
+            container_instance = container_instances.prepare(invocation, worker_index)
+    if warm_up is not None:
+        # after preparing the container instance, so the warm-up also runs inside the instance
+        with profiler.stage("warm-up"):
+            warm_up.prepare(invocation, cpus)
+    # execute the invocation
+    notes = []
+
+    if invocation.export == True and tool.get_export_format() is not None:
+        # we do not want to change the command in .json file, only for this execution
+        export_value_file = os.path.join(settings.results_dir_exports(), invocation.get_identifier()) + tool.get_export_format()
+        invocation.command = invocation.command + " " + tool.get_export_command(export_value_file)
+        invocation.export_value_file = export_value_file
+
+    # the output of the tool is streamed to these (hidden) files and copied to the logfile afterwards
+    output_path = set_artifact_dir(os.path.join(settings.results_dir_logs(), "." + invocation.get_identifier()))
+    with profiler.stage("execute"):
+        execution = invocation.execute(cpus, memory_limit_method, output_path, warm_up is None or warm_up.is_warm_up_run())
+    tool_result = execution.to_json()
+    if predicted_time is not None:
+        tool_result["predicted-wallclock-time"] = str(predicted_time)
+    elif prediction_source is not None:
+        tool_result["prediction-source"] = prediction_source
+    if invocation.prebuilt_model is not None:
+        # the time for building the model is paid once for all invocations of the benchmark
+        tool_result["prebuilt-model"] = invocation.prebuilt_model[0]
+        tool_result["model-build-time"] = str(invocation.prebuilt_model[1])
+    if container_instance is not None:
+        # the startup of the container is paid once per worker and image and is not part of the wallclock-time
+        tool_result["container-instance"] = container_instance["name"]
+        tool_result["container-startup-time"] = str(container_instance["container-startup-time"])
+        if "container-exec-time" in container_instance:
+            tool_result["container-exec-time"] = str(container_instance["container-exec-time"])
+    success = False
     try:
-        for invocation in invocations:
-            if invocation.tool == "storm":
-                tool = storm
-            elif invocation.tool == "prism":
-                tool = prism
-            elif invocation.tool == "sds":
-                tool = sds
-            elif invocation.tool == "greatspn":
-                tool = greatspn
-            else:
-                raise AssertionError("Tool '{}' is not allowed.".format(invocation.tool))
-
-            invocation_number = invocation_number + 1
-            if len(invocations) > 1:
-                progressbar.print_progress(invocation_number)
-            # execute the invocation
-            notes = []
-
-            if invocation.export == True and tool.get_export_format() is not None:
-                # we do not want to change the command in .json file, only for this execution
-                export_value_file = os.path.join(settings.results_dir_exports(), invocation.get_identifier()) + tool.get_export_format()
-                invocation.command = invocation.command + " " + tool.get_export_command(export_value_file)
-                invocation.export_value_file = export_value_file
-
-            execution = invocation.execute()
-            tool_result = execution.to_json()
+        success = tool.check_execution(settings, execution)
+    except Exception as e:
+        print("ERROR while getting result for invocation {}".format(invocation.get_identifier()))
+        # traceback.print_exc()
+    # if the execution was successful, we save the mc-time
+    if success:
+        mc_time = tool.get_mc_time(execution)
+        if mc_time is not None:
+            tool_result["mc-time"] = str(mc_time)
+            # wallclock-time was already set in execution
+    elif not execution.timeout and not execution.error:
+        notes.append("Unable to obtain tool result.")
+        tool_result["execution-error"] = True
+    # the time of the phases (e.g. model construction) is also useful for timeouts
+    timing_info = tool.get_timing_info(execution)
+    if timing_info is not None:
+        for key, value in timing_info.items():
+            tool_result[key] = str(value)
+    if success and measurement is not None:
+        measurement.add(execution.wall_time, OrderedDict([("wallclock-time", execution.wall_time),
+                                                          ("mc-time", tool_result.get("mc-time"))]))
+        while measurement.needs_repetition():
+            with profiler.stage("execute-repetition"):
+                repetition = invocation.execute(cpus, memory_limit_method, None, False)
             try:
-                success = tool.check_execution(settings, execution)
+                repetition_success = not repetition.timeout and not repetition.error and tool.check_execution(settings, repetition)
+                repetition_mc_time = tool.get_mc_time(repetition) if repetition_success else None
             except Exception as e:
-                print("ERROR while getting result for invocation #{}: {}".format(invocation_number - 1,
-                                                                                 invocation.get_identifier()))
-                # traceback.print_exc()
-            # if the execution was successful, we save the mc-time
-            if success:
-                mc_time = tool.get_mc_time(execution)
-                if mc_time is not None:
-                    tool_result["mc-time"] = str(mc_time)
-                    # wallclock-time was already set in execution
-            elif not execution.timeout and not execution.error:
-                notes.append("Unable to obtain tool result.")
-                tool_result["execution-error"] = True
-            tool_result["notes"] = notes
-            logfile_name = invocation.get_identifier() + ".log"
-            tool_result["log"] = logfile_name
-
-            if invocation.export == True:
-                if tool.get_export_format() is not None:
-                    # export is set and tool supports export
-                    if os.path.isfile(set_artifact_dir(invocation.export_value_file)):
-                        tool_result["export-value-file"] = invocation.export_value_file
-                    else: notes.append(("Export file {} does not exist.").format(invocation.export_value_file))
-                else: notes.append("Tool does not support file export.")
-
-            # save --statistic data
-            num_states = tool.get_num_states(execution)
-            if num_states is not None:
-                tool_result["states"] = int(num_states)
-
-            num_trans_states = tool.get_num_trans_states(execution)
-            if num_trans_states is not None:
-                tool_result["transient-states"] = str(num_trans_states)
-
-            num_sccs = tool.get_num_sccs(execution)
-            if num_sccs is not None:
-                tool_result["non-bottom-SCCs"] = str(num_sccs)
-
-            num_bsccs = tool.get_num_bsccs(execution)
-            if num_bsccs is not None:
-                tool_result["bottom-SCCs"] = str(num_bsccs)
-
-            max_scc_size = tool.get_max_scc_size(execution)
-            if max_scc_size is not None:
-                tool_result["max-non-bottom-SCC-size"] = str(max_scc_size)
-
-            max_bscc_size = tool.get_max_bscc_size(execution)
-            if max_bscc_size is not None:
-                tool_result["max-bottom-SCC-size"] = str(max_bscc_size)
-
-            topology = tool.get_topology(execution)
-            if topology is not None:
-                tool_result["topology"] = str(topology)
-
-            max_scc_chain_length = tool.get_max_scc_chain_length(execution)
-            if max_scc_chain_length is not None:
-                tool_result["max-SCC-chain-length"] = str(max_scc_chain_length)
-
-            # save logfile
-            path=set_artifact_dir(os.path.join(settings.results_dir_logs(), logfile_name))
-            with open(path, 'w', encoding="utf-8") as logfile:
-                logfile.write(execution.concatenate_logs())
-                if len(notes) > 0:
-                    logfile.write("\n" + "#" * 30 + " Notes " + "#" * 30 + "\n")
-                for note in notes:
-                    logfile.write(note + "\n")
-            # save tool results in json format
-            save_json(tool_result, os.path.join(settings.results_dir_logs(), invocation.get_identifier() + ".json"))
+                repetition_success = False
+            if not repetition_success:
+                notes.append("Repetition #{} failed, stopped repeating.".format(measurement.repetitions + 1))
+                break
+            measurement.add(repetition.wall_time, OrderedDict([("wallclock-time", repetition.wall_time),
+                                                               ("mc-time", repetition_mc_time)]))
+        for key, value in measurement.to_json().items():
+            tool_result[key] = value
+        # the times of the invocation are the medians of all repetitions
+        tool_result["wallclock-time"] = str(tool_result["wallclock-time-median"])
+        if "mc-time-median" in tool_result:
+            tool_result["mc-time"] = str(tool_result["mc-time-median"])
+    tool_result["notes"] = notes
+    logfile_name = invocation.get_identifier() + ".log"
+    tool_result["log"] = logfile_name
+
+    if invocation.export == True:
+        if tool.get_export_format() is not None:
+            # export is set and tool supports export
+            if os.path.isfile(set_artifact_dir(invocation.export_value_file)):
+                tool_result["export-value-file"] = invocation.export_value_file
+            else: notes.append(("Export file {} does not exist.").format(invocation.export_value_file))
+        else: notes.append("Tool does not support file export.")
+
+    # save --statistic data
+    num_states = tool.get_num_states(execution)
+    if num_states is not None:
+        tool_result["states"] = int(num_states)
+
+    num_trans_states = tool.get_num_trans_states(execution)
+    if num_trans_states is not None:
+        tool_result["transient-states"] = str(num_trans_states)
+
+    num_sccs = tool.get_num_sccs(execution)
+    if num_sccs is not None:
+        tool_result["non-bottom-SCCs"] = str(num_sccs)
+
+    num_bsccs = tool.get_num_bsccs(execution)
+    if num_bsccs is not None:
+        tool_result["bottom-SCCs"] = str(num_bsccs)
+
+    max_scc_size = tool.get_max_scc_size(execution)
+    if max_scc_size is not None:
+        tool_result["max-non-bottom-SCC-size"] = str(max_scc_size)
+
+    max_bscc_size = tool.get_max_bscc_size(execution)
+    if max_bscc_size is not None:
+        tool_result["max-bottom-SCC-size"] = str(max_bscc_size)
+
+    topology = tool.get_topology(execution)
+    if topology is not None:
+        tool_result["topology"] = str(topology)
+
+    max_scc_chain_length = tool.get_max_scc_chain_length(execution)
+    if max_scc_chain_length is not None:
+        tool_result["max-SCC-chain-length"] = str(max_scc_chain_length)
+
+    # save logfile (the log and json files are replaced atomically, so parallel workers never see partial files)
+    with profiler.stage("write-log"):
+        with open_atomic(os.path.join(settings.results_dir_logs(), logfile_name), encoding="utf-8") as logfile:
+            execution.write_log(logfile)
+            if len(notes) > 0:
+                logfile.write("\n" + "#" * 30 + " Notes " + "#" * 30 + "\n")
+            for note in notes:
+                logfile.write(note + "\n")
+        execution.remove_output_files()
+    # save tool results in json format
+    with profiler.stage("write-json"):
+        save_json(tool_result, os.path.join(settings.results_dir_logs(), invocation.get_identifier() + ".json"))
+    return tool_result
+
+
+def record_pruned_invocation(settings, invocation, cause):
+    """ Saves a result (a timeout marked as 'pruned') and a log file for an invocation that is not executed due to pruning. """
+    tool_result = invocation.to_json()
+    tool_result["wallclock-time"] = str(invocation.time_limit)
+    tool_result["timeout"] = True
+    tool_result["execution-error"] = False
+    tool_result["pruned"] = True
+    tool_result["pruned-by"] = cause
+    note = "Not executed since the invocation {} on a smaller instance ran into a timeout or memout.".format(cause)
+    tool_result["notes"] = [note]
+    logfile_name = invocation.get_identifier() + ".log"
+    tool_result["log"] = logfile_name
+    with open_atomic(os.path.join(settings.results_dir_logs(), logfile_name), encoding="utf-8") as logfile:
+        logfile.write("Command:\t{}\nPruned:\t{}\n".format(invocation.command, note))
+    save_json(tool_result, os.path.join(settings.results_dir_logs(), invocation.get_identifier() + ".json"))
+    return tool_result
+
+
+def run_invocations(settings, invocations, num_jobs=1, cpus_per_job=None, memory_budget=None, memory_limit_method=None,
+                    force=False, warm_up_strategy="prime", repetitions=1, repetition_budget=60.0, use_queue=False, prune=False):
+    """
+    Executes the invocations using num_jobs parallel workers, each pinned to its own core set.
+    If a memory budget (in MiB) is given, invocations are only started if their estimated memory fits into the budget.
+    If memory_limit_method is given, memory limits declared by the invocations are enforced using this method.
+    Invocations with a complete and up-to-date result from a previous run are skipped unless force is set.
+    Before each invocation, there is a warm-up according to the given strategy (see WARM_UP_STRATEGIES).
+    If repetitions is larger than 1, each successful invocation is executed up to this number of times
+    (but stops earlier once the median is precise enough or the repetition budget (in seconds) is exceeded).
+    If use_queue is set, the invocations are added to the work queue in the results directory and the workers claim
+    invocations from the queue (possibly added by other processes) until it is empty.
+    If prune is set, the instances of each family are executed in ascending order of their sizes and instances that are
+    at least as large as an instance that ran into a timeout or memout are not executed (see Pruning).
+    With several workers (or a queue), the invocations with the longest predicted runtime are started first. Only then,
+    the runtimes are predicted based on previous results (see RuntimePredictor), using the saved model if it is up to
+    date. Otherwise, the static estimates are used (e.g. for the progress).
+    If a model cache directory is set, models are built once per benchmark and shared by all its invocations (see ModelCache).
+    If a result cache directory is set, invocations with a cached result are not executed (unless force is set) and the
+    results of executed invocations are added to the cache (see ResultCache).
+    """
+    with profiler.stage("journal"):
+        journal = Journal(settings)
+    if force:
+        # compute the fingerprints before the commands get modified during the execution
+        for invocation in invocations:
+            journal.fingerprint(invocation)
+    else:
+        with profiler.stage("journal"):
+            invocations = journal.filter(invocations)
+    previous_results = []  # the logs directory is scanned at most once (and only if needed)
+
+    def get_previous_results():
+        if len(previous_results) == 0:
+            with profiler.stage("load-results"):
+                previous_results.append(load_results(settings))
+        return previous_results[0]
+
+    with profiler.stage("predict"):
+        predictor = RuntimePredictor(settings)
+        if is_saved_model_up_to_date(settings):
+            predictor.load(get_model_path(settings))
+        elif (num_jobs > 1 or use_queue) and len(invocations) > 1:
+            # training is only worth it if the predictions determine the order
+            predictor.train(get_previous_results())
+        predicted_times = dict((invocation.get_identifier(), predictor.predict(invocation)) for invocation in invocations)
+        # without a trained model, the predictions are the static estimates, which are neither reported nor stored
+        model_predictions = predicted_times if predictor.weights is not None else dict()
+    if num_jobs > 1 or use_queue:
+        # longest processing time first minimizes the makespan
+        invocations = sorted(invocations, key=lambda invocation: -predicted_times[invocation.get_identifier()])
+        print("Ordering invocations by predicted runtime (longest first){}.".format(
+            "" if predictor.weights is None else ", model trained on {} results".format(predictor.num_samples)))
+    pruning = None
+    if prune:
+        pruning = Pruning(settings, not force, get_previous_results() if not force else None)
+        invocations = pruning.order(invocations)
+    queue = None
+    if use_queue:
+        queue = WorkQueue(settings)
+        num_added = queue.add(invocations, memory_limit_method)
+        num_pending, num_claimed, num_done = queue.get_counts()
+        print("Added {} invocations to the work queue in {} ({} pending, {} claimed by other workers, {} done).".format(
+            num_added, queue.directory, num_pending, num_claimed, num_done))
+        if num_pending == 0:
+            print("Nothing to do.")
+            return
+    elif len(invocations) == 0:
+        print("Nothing to do.")
+        return
+    warm_up = WarmUp(settings, warm_up_strategy)
+    model_cache = ModelCache(settings, settings.model_cache_dir()) if settings.model_cache_dir() is not None else None
+    container_instances = ContainerInstances(settings) if settings.use_container_instances() else None
+    result_cache = None
+    if settings.result_cache_dir() is not None:
+        # results measured in a different mode (e.g. with prebuilt models or a warm container) are not reused
+        mode = OrderedDict([("model-cache", model_cache is not None), ("container-instances", container_instances is not None),
+                            ("warm-up", warm_up_strategy), ("repetitions", repetitions),
+                            ("repetition-budget", repetition_budget if repetitions > 1 else None),
+                            ("memory-limit-method", memory_limit_method)])
+        result_cache = ResultCache(settings, settings.result_cache_dir(), settings.result_cache_size(), mode)
+    memory_estimator = MemoryEstimator(settings, results=get_previous_results()) if memory_budget is not None else None
+    scheduler = Scheduler(num_jobs, cpus_per_job, memory_budget=memory_budget, memory_estimator=memory_estimator)
+    if num_jobs > 1:
+        print("Executing invocations with {} workers on core sets {}".format(
+            num_jobs, ", ".join([",".join(str(c) for c in worker.cpus) for worker in scheduler.workers])))
+    if memory_budget is not None:
+        print("Admitting invocations within a memory budget of {:.0f} MiB".format(memory_budget))
+    events = EventLog(settings)
+    events.emit("run-started", invocations=len(invocations), queue=queue is not None, jobs=num_jobs)
+    if queue is None:
+        view = ProgressView(len(invocations), model_predictions, num_jobs)
+    else:
+        view = ProgressView(None, None, num_jobs, "Executing invocations from the queue")
+    results = dict()  # identifier -> result json of the finished invocations that were not yet reported
+    num_finished = [0]
+
+    def on_finished(index, invocation):
+        num_finished[0] += 1
+        result = results.pop(invocation.get_identifier(), None)
+        if result is not None:
+            view.finished(invocation, result)
+
+    def execute(invocation, worker):
+        with profiler.stage("invocation"):
+            execute_and_record(invocation, worker)
+
+    def execute_and_record(invocation, worker):
+        # invocations claimed from the queue have not been fingerprinted yet
+        with profiler.stage("fingerprint"):
+            journal.fingerprint(invocation)
+        predicted_time = None
+        if predictor.weights is not None:
+            # invocations claimed from the queue might have been added by another process
+            predicted_time = model_predictions.get(invocation.get_identifier())
+            if predicted_time is None:
+                predicted_time = predictor.predict(invocation)
+        events.invocation_started(invocation, worker.index, predicted_time)
+        cause = pruning.get_pruning_cause(invocation) if pruning is not None else None
+        result = None
+        if cause is not None:
+            result = record_pruned_invocation(settings, invocation, cause)
+        elif result_cache is not None and not force:
+            with profiler.stage("result-cache"):
+                result = result_cache.lookup(invocation, journal.fingerprint(invocation))
+        if result is None:
+            measurement = RepeatedMeasurement(repetitions, repetition_budget) if repetitions > 1 else None
+            # invocations from the queue are executed with the limits with which they were added
+            method = invocation.memory_limit_method if invocation.memory_limit_method is not None else memory_limit_method
+            result = execute_invocation(settings, invocation, worker.cpus, method, warm_up, measurement,
+                                        predicted_time, model_cache, container_instances, worker.index,
+                                        "heuristic" if predicted_time is None else None)
+            if result_cache is not None:
+                with profiler.stage("result-cache"):
+                    result_cache.store(invocation, journal.fingerprint(invocation), result, force)
+        if pruning is not None:
+            pruning.record(invocation, result)
+        with profiler.stage("journal"):
+            journal.record(invocation, result)
+        events.invocation_finished(invocation, result, worker.index)
+        results[invocation.get_identifier()] = result
+
+    try:
+        if queue is not None:
+            scheduler.run_queue(queue, execute, on_finished)
+        else:
+            scheduler.run(invocations, execute, on_finished)
+        view.close()
+        events.emit("run-finished", finished=num_finished[0])
     except KeyboardInterrupt as e:
-        print("\nInterrupt while processing invocation #{}: {}".format(invocation_number - 1,
-                                                                       invocation.get_identifier()))
-    except Exception:
-        print("ERROR while processing invocation #{}: {}".format(invocation_number - 1, invocation.get_identifier()))
-        traceback.print_exc()
+        events.emit("run-interrupted", finished=num_finished[0])
+        if queue is not None:
+            print("\nInterrupt after processing {} invocations. Claimed invocations were put back into the queue.".format(
+                num_finished[0]))
+        else:
+            print("\nInterrupt after processing {} of {} invocations.".format(num_finished[0], len(invocations)))
+    finally:
+        if container_instances is not None:
+            container_instances.stop_all()
 
 
 if __name__ == "__main__":
@@ -356,18 +645,97 @@ if __name__ == "__main__":
 
 
     # Allow -b only if -f not set and vice versa
-    group = parser.add_mutually_exclusive_group(required=True)
+    group = parser.add_mutually_exclusive_group(required=False)
 
     group.add_argument('-b', '--benchmarks',
                         help="A .csv containing the benchmark set. ", required=False)
 
+    group.add_argument('-s', '--spec',
+                       help="Creates the invocations non-interactively from an experiment specification (.json or .toml) "
+                            "describing the benchmark selection, model types, tools, solvers, configurations, precisions, "
+                            "time limit and export (see internal/spec.py). Usage: '-s <spec>'", required=False)
     group.add_argument('-f', '--file',
                        help="Executes benchmarks from a previously created invocations file located at <filename>.  "
                             "Omit to create a new set of invocations."
                             "Usage: '-f <filename>'. ", required=False)
+    parser.add_argument('--save',
+                        help="Only has an effect if the spec is set via [-s, --spec]. Writes the invocations of the spec to the "
+                             "invocations file <filename> (one after another, without keeping them in memory) instead of executing them. "
+                             "Usage: '-s <spec> --save <filename>'", required=False)
     parser.add_argument('-i', '--invocation', help="Only has an effect if the invocation file is set via [-f, --file]. "
                                                    "Executes the <n>th invocation (0 based) from a previously created invocations file located at <filename>."
                                                    "Usage: '-f <filename>' -i <n>", required=False)
+    parser.add_argument('--shard', help="Only has an effect if the invocation file is set via [-f, --file]. "
+                                         "Executes the k-th of K shards (1 <= k <= K) of the invocations. The shards are deterministic "
+                                         "and balanced according to the estimated runtimes, e.g. for SLURM job arrays. Usage: '-f <filename>' --shard <k>/<K>",
+                        required=False)
+    parser.add_argument('--queue', action='store_true',
+                        help="Executes the invocations via the work queue in the results directory: the invocations of the file given "
+                             "via [-f, --file] (if any) are added to the queue and the invocations of the queue are executed until it is empty. "
+                             "Any number of processes (e.g. on different nodes with a shared file system) can work on the same queue. "
+                             "The invocations are executed with the limits (and memory limit method) with which they were added. "
+                             "Usage: '-f <filename> --queue' or just '--queue' to join other workers.", required=False)
+    parser.add_argument('--prune', action='store_true',
+                        help="Executes the instances of each model (and property) in ascending order of their sizes and skips all instances "
+                             "that are at least as large as an instance on which the same tool, configuration, solver and precision ran into "
+                             "a timeout or memout. Skipped instances are recorded as timeouts (marked as 'pruned'). Pruned instances are not "
+                             "final, i.e., they are executed when running again without --prune or once the cause no longer applies.", required=False)
+    parser.add_argument('--profile', action='store_true',
+                        help="Records the time spent in each stage of the harness (checking, executing, parsing, writing) and in each "
+                             "function of the tool adapters and saves a report to 'profile-run.json' in the results directory.",
+                        required=False)
+    parser.add_argument('--model-cache',
+                        help="Directory of a cache of prebuilt models. The model of each benchmark is built once (e.g. exported by Storm "
+                             "to an explicit DRN file) and all invocations of the benchmark load the prebuilt model instead of building "
+                             "it again. The cache is content-addressed and can be shared by several result directories and processes. "
+                             "Usage: --model-cache path/to/cache", required=False)
+    parser.add_argument('--result-cache',
+                        help="Directory of a cache of results that can be shared by several result directories. Invocations whose "
+                             "command, tool binary (or container image), model files and limits match a cached result are not executed; "
+                             "the cached result, log and exported values are copied instead. Usage: --result-cache path/to/cache",
+                        required=False)
+    parser.add_argument('--result-cache-size', type=float,
+                        help="Only has an effect if --result-cache is set. Maximal size (in MiB) of the result cache, the least "
+                             "recently used results are removed if it is exceeded. Unlimited per default. Usage: --result-cache-size <MiB>",
+                        required=False)
+    parser.add_argument('--container-instances', action='store_true',
+                        help="Executes containerized tools (e.g. 'apptainer run image.sif ...') in persistent container instances: each "
+                             "worker starts one instance per container image and executes the invocations inside it, so the container "
+                             "is not set up again for each invocation. The instances are stopped at the end. The startup time of the "
+                             "instance is recorded separately ('container-startup-time') and not part of the wallclock-time.",
+                        required=False)
+    parser.add_argument('--force', action='store_true',
+                        help="Executes all invocations, even those with a complete result from a previous run "
+                             "(according to the journal in the results directory) or in the result cache.", required=False)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of invocations that are executed in parallel. "
+                             "Each job is pinned to its own set of cores. Usage: -j <n>", required=False)
+    parser.add_argument('--cpus-per-job', type=int,
+                        help="Only has an effect if [-j, --jobs] is larger than 1. Number of cores in the core set of each job. "
+                             "Per default, the available cores are split evenly among the jobs. Usage: --cpus-per-job <n>", required=False)
+    parser.add_argument('--memory-budget',
+                        help="Memory (in MiB) that all parallel jobs may use together. An invocation is only started if its estimated "
+                             "memory consumption (declared limit, previous runs or number of states) fits into the remaining budget. "
+                             "'auto' uses the memory limit of the cgroup or the node. Usage: --memory-budget <MiB|auto>", required=False)
+    parser.add_argument('--memory-limit',
+                        help="Hard memory limit (in MiB) for each invocation that does not declare its own 'memory-limit'. "
+                             "Executions exceeding the limit are classified as memory-out (MO). Usage: --memory-limit <MiB>", required=False)
+    parser.add_argument('--memory-limit-method', choices=["auto", "cgroup", "rlimit"],
+                        help="How memory limits are enforced: a cgroup v2 sub-group per invocation (precise, kills the whole process tree), "
+                             "RLIMIT_AS of the tool process, or 'auto' (cgroup if available, otherwise rlimit).", required=False)
+    parser.add_argument('--warm-up', choices=WARM_UP_STRATEGIES, default="prime",
+                        help="Warm-up before each invocation: 'none', 'prime' loads the model files, the tool binary and the container "
+                             "image into the page cache (default), 'per-tool' additionally runs each tool once per batch for 5 seconds, "
+                             "'run' runs each invocation for 5 seconds before the actual execution.", required=False)
+    parser.add_argument('--repetitions', type=int, default=1,
+                        help="Maximal number of executions of each (successful) invocation. Repetitions stop once the {:.0f}%% confidence "
+                             "interval of the median time is narrow enough or the repetition budget is exceeded. "
+                             "The result contains all samples, their median, IQR and confidence interval. Usage: --repetitions <n>".format(CONFIDENCE * 100),
+                        required=False)
+    parser.add_argument('--repetition-budget', type=float, default=60.0,
+                        help="Only has an effect if --repetitions is larger than 1. Time (in seconds) that may be spent on the repetitions "
+                             "of a single invocation, i.e., long running invocations are executed only once. Usage: --repetition-budget <s>",
+                        required=False)
 
 
     args = parser.parse_args()
@@ -377,8 +745,40 @@ if __name__ == "__main__":
 
     settings = Settings(task, args.results_dir)
     settings.ensure_result_dirs()
-
-    if args.file is None:
+    if args.model_cache is not None:
+        settings.json_data["model-cache-directory"] = args.model_cache
+    settings.json_data["container-instances"] = args.container_instances
+    if args.result_cache is not None:
+        settings.json_data["result-cache-directory"] = args.result_cache
+        settings.json_data["result-cache-size"] = args.result_cache_size
+    if args.profile:
+        profiler.enable()
+        for tool in [greatspn, sds, storm, prism]:
+            profiler.instrument(tool)
+
+    if args.spec is not None:
+        spec = load_spec(args.spec)
+        unsupported = []
+        if args.save is not None:
+            if is_invocation_store(args.save):
+                num_invocations = save_invocation_store(settings, (invocation.to_json() for invocation in
+                                                                   iterate_spec_invocations(settings, spec, unsupported)), args.save)
+            else:
+                num_invocations = save_invocations(iterate_spec_invocations(settings, spec, unsupported), args.save)
+        else:
+            invocations = list(iterate_spec_invocations(settings, spec, unsupported))
+            num_invocations = len(invocations)
+        print("Created {} invocations from spec '{}' ({} combinations are not supported).".format(
+            num_invocations, args.spec, len(unsupported)))
+        if args.save is not None:
+            print("Saved the invocations to file '{}'. To execute them, you may run\n\tpython3 {} -t {} -r {} -f {}".format(
+                args.save, sys.argv[0], task, args.results_dir, args.save))
+            sys.exit(0)
+    elif args.file is None and args.benchmarks is None:
+        if not args.queue: raise AssertionError("One of the arguments -b/--benchmarks, -s/--spec or -f/--file is required.")
+        # only work on the invocations that are already in the queue
+        invocations = []
+    elif args.file is None:
 
         benchmark_selection = args.benchmarks
         if not os.path.isfile(set_artifact_dir(args.benchmarks)):
@@ -411,10 +811,24 @@ if __name__ == "__main__":
         # invocations file exists
         if not os.path.isfile(set_artifact_dir(args.file)):
             raise AssertionError("Invocations file {} does not exist".format(args.file))
-        invocations_json = load_json(args.file)
-        invocations = [Invocation(inv) for inv in invocations_json]
-        print("Loaded {} invocations.".format(len(invocations)))
-        if args.invocation is not None:
+        store = None
+        with profiler.stage("load-invocations"):
+            if is_invocation_store(args.file):
+                # single invocations and shards are read via the index of the store without loading all invocations
+                store = InvocationStore(settings, args.file)
+                if args.invocation is None and (args.shard is None or os.path.isfile(set_artifact_dir(get_model_path(settings)))):
+                    invocations = store.get_all()
+            else:
+                invocations_json = load_json(args.file)
+                invocations = [Invocation(inv) for inv in invocations_json]
+        print("Loaded {} invocations.".format(len(store) if store is not None else len(invocations)))
+        if store is not None and args.invocation is not None:
+            if not is_number(args.invocation): raise AssertionError(
+                "Expected a number for second argument but got '{}' instead.".format(args.invocation))
+            selected_index = int(args.invocation)
+            invocations = store.get([selected_index])
+            print("Selected invocation #{}: {}".format(selected_index, invocations[0].get_identifier()))
+        elif args.invocation is not None:
             if not is_number(args.invocation): raise AssertionError(
                 "Expected a number for second argument but got '{}' instead.".format(args.invocation))
             selected_index = int(args.invocation)
@@ -423,6 +837,46 @@ if __name__ == "__main__":
                     selected_index, len(invocations)))
             invocations = [invocations[selected_index]]
             print("Selected invocation #{}: {}".format(selected_index, invocations[0].get_identifier()))
-
-    check_invocations(settings, invocations)
-    run_invocations(settings, invocations)
+        if args.shard is not None:
+            if args.invocation is not None: raise AssertionError("The arguments -i and --shard can not be combined.")
+            k, num_shards = parse_shard(args.shard)
+            costs = None
+            if os.path.isfile(set_artifact_dir(get_model_path(settings))):
+                # all shards have to use the same predictions, hence we only use a saved model (see slurm.py)
+                predictor = RuntimePredictor(settings)
+                predictor.load(get_model_path(settings))
+                costs = [predictor.predict(invocation) for invocation in invocations]
+            if store is not None and costs is None:
+                # the index contains the static costs, hence only the invocations of the shard are read
+                invocations = store.select_shard(k, num_shards)
+            else:
+                invocations = [invocations[i] for i in select_shard(settings, invocations, k, num_shards, costs)]
+            print("Selected {} invocations of shard {}/{}.".format(len(invocations), k, num_shards))
+
+    if len(invocations) > 0:
+        with profiler.stage("check-invocations"):
+            check_invocations(settings, invocations)
+    memory_budget = None
+    if args.memory_budget is not None:
+        if args.memory_budget == "auto":
+            memory_budget = get_available_memory()
+        elif is_number(args.memory_budget):
+            memory_budget = float(args.memory_budget)
+        else:
+            raise AssertionError("Expected a number or 'auto' for the memory budget but got '{}' instead.".format(args.memory_budget))
+    if args.memory_limit is not None:
+        if not is_number(args.memory_limit): raise AssertionError(
+            "Expected a number for the memory limit but got '{}' instead.".format(args.memory_limit))
+        for invocation in invocations:
+            if invocation.memory_limit is None:
+                invocation.memory_limit = float(args.memory_limit)
+    memory_limit_method = args.memory_limit_method
+    if memory_limit_method is None and any(invocation.memory_limit is not None for invocation in invocations):
+        memory_limit_method = "auto"
+    if memory_limit_method is not None:
+        print("Enforcing memory limits via {}".format(MemoryLimit(0, memory_limit_method).method))
+    run_invocations(settings, invocations, args.jobs, args.cpus_per_job, memory_budget, memory_limit_method, args.force,
+                    args.warm_up, args.repetitions, args.repetition_budget, args.queue,
+                    args.prune)
+    if args.profile:
+        profiler.save(os.path.join(settings.results_dir(), "profile-run.json"))
@@ -0,0 +1,137 @@
+import argparse
+import glob
+from internal.invocation import *
+from internal.settings import *
+from internal.sharding import *
+from internal.prediction import *
+
+SCRIPT_HEADER = """#!/usr/bin/zsh
+
+### Job Parameters
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task={cpus_per_task}
+#SBATCH --time={time}
+#SBATCH --job-name={job_name}
+#SBATCH --array=0-{last_task}
+#SBATCH --output={output}
+
+### Program Code
+cd {directory} || exit
+
+echo "------------------------------------------------------------"
+echo "SLURM JOB NAME: $SLURM_JOB_NAME"
+echo "SLURM JOB ID: $SLURM_ARRAY_JOB_ID, TASK: $SLURM_ARRAY_TASK_ID"
+echo "Running on nodes: $SLURM_NODELIST"
+echo "Started at $(date)"
+echo "------------------------------------------------------------"
+
+case $SLURM_ARRAY_TASK_ID in
+"""
+
+SCRIPT_FOOTER = """    *)
+        echo "Unknown array task $SLURM_ARRAY_TASK_ID"
+        exit 1
+        ;;
+esac
+
+echo "------------------------------------------------------------"
+echo "Finishing at $(date)"
+echo "------------------------------------------------------------"
+"""
+
+
+def distribute_tasks(costs, sizes, num_tasks):
+    """
+    Distributes num_tasks array tasks among the invocation files proportionally to their total costs (largest remainder).
+    Each file gets at least one task but never more tasks than it has invocations.
+    """
+    total_cost = sum(costs)
+    shares = [num_tasks * cost / total_cost if total_cost > 0 else num_tasks / len(costs) for cost in costs]
+    num_shards = [max(1, min(size, int(math.floor(share)))) for share, size in zip(shares, sizes)]
+    for i in sorted(range(len(costs)), key=lambda i: (-(shares[i] - math.floor(shares[i])), i)):
+        if sum(num_shards) >= num_tasks:
+            break
+        if num_shards[i] < sizes[i]:
+            num_shards[i] += 1
+    return num_shards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a single SLURM array script that executes all invocation files of a directory. "
+                                                 "Each file is split into shards (see run.py --shard) whose number depends on the estimated runtime of its invocations. "
+                                                 "Usage: 'python3 slurm.py -t <task> -n <tasks>'")
+    parser.add_argument('-t', '--task',
+                        help="Choose a task from 'evts' and 'stationary'.", required=True)
+    parser.add_argument('-d', '--directory', default="$ARTIFACT_DIR/Evaluation",
+                        help="The directory containing the invocation files (*.json and invocation stores *.jsonl). The jobs are executed in this directory. "
+                             "Usage: -d path/to/directory", required=False)
+    parser.add_argument('-r', '--results_dir', default="results",
+                        help="The result directory (relative to the directory of the invocation files). Usage: -r path/to/result/... ",
+                        required=False)
+    parser.add_argument('-n', '--tasks', type=int, default=100,
+                        help="Approximate number of array tasks. Usage: -n <tasks>", required=False)
+    parser.add_argument('-o', '--output',
+                        help="The generated script. Defaults to 'array.sh' in the directory of the invocation files. Usage: -o <filename>",
+                        required=False)
+    parser.add_argument('--time', default="72:00:00", help="Time limit of each array task. Usage: --time <hh:mm:ss>", required=False)
+    parser.add_argument('--cpus-per-task', type=int, default=1, help="Number of CPUs of each array task. Usage: --cpus-per-task <n>",
+                        required=False)
+    parser.add_argument('--job-name', default="stationary-eval", help="Name of the array job. Usage: --job-name <name>", required=False)
+    parser.add_argument('--run-args', default="",
+                        help="Additional arguments for run.py, e.g. --run-args='--warm-up none'.", required=False)
+    args = parser.parse_args()
+    task = str(args.task)
+    if task not in ["evts", "stationary"]:
+        raise AssertionError("The task argument has to be set to 'evts' or 'stationary'.")
+    if args.tasks < 1:
+        raise AssertionError("The number of tasks has to be at least 1.")
+
+    directory = os.path.realpath(set_artifact_dir(args.directory))
+    settings = Settings(task, os.path.join(directory, args.results_dir))
+    filenames = sorted(glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.jsonl")))
+    # a json array next to an invocation store with the same name is (usually) its source, i.e., the same invocations
+    filenames = [filename for filename in filenames if not filename.endswith(".idx") and
+                 not (filename.endswith(".json") and os.path.splitext(filename)[0] + ".jsonl" in filenames)]
+    invocation_files = load_invocation_files(filenames)
+    if len(invocation_files) == 0:
+        raise AssertionError("No invocation files found in '{}'.".format(directory))
+
+    # the shards use the saved runtime model, so they all compute the same partition
+    predictor = RuntimePredictor(settings)
+    if predictor.train() > 0:
+        ensure_directory(settings.results_dir())
+        predictor.save(get_model_path(settings))
+        print("Trained runtime model on {} results (typical error: factor {:.1f}), saved to '{}'.".format(
+            predictor.num_samples, math.exp(predictor.training_error), get_model_path(settings)))
+    elif os.path.isfile(set_artifact_dir(get_model_path(settings))):
+        os.remove(set_artifact_dir(get_model_path(settings)))
+    file_costs = []
+    for filename, invocations in invocation_files:
+        file_costs.append(sum(predictor.predict(invocation) for invocation in invocations))
+    num_shards = distribute_tasks(file_costs, [len(invocations) for _, invocations in invocation_files], args.tasks)
+
+    run_script = os.path.relpath(os.path.join(os.path.realpath(sys.path[0]), "run.py"), directory)
+    lines = []
+    task_id = 0
+    for (filename, invocations), shards in zip(invocation_files, num_shards):
+        for k in range(1, shards + 1):
+            command = "python3 {} -t {} -r {} -f {}".format(run_script, task, args.results_dir, os.path.basename(filename))
+            if shards > 1:
+                command = command + " --shard {}/{}".format(k, shards)
+            if args.run_args != "":
+                command = command + " " + args.run_args
+            lines.append("    {})\n        {}\n        ;;\n".format(task_id, command))
+            task_id += 1
+
+    output = args.output if args.output is not None else os.path.join(directory, "array.sh")
+    with open_atomic(output) as script_file:
+        script_file.write(SCRIPT_HEADER.format(cpus_per_task=args.cpus_per_task, time=args.time, job_name=args.job_name,
+                                               last_task=task_id - 1,
+                                               output=os.path.join(directory, args.results_dir, "slurm-%A_%a.txt"),
+                                               directory=directory))
+        script_file.writelines(lines)
+        script_file.write(SCRIPT_FOOTER)
+    os.chmod(set_artifact_dir(output), 0o755)
+    print("Generated array script '{}' with {} tasks for {} invocation files ({} invocations).".format(
+        output, task_id, len(invocation_files), sum(len(invocations) for _, invocations in invocation_files)))
+    print("Submit it via\n\tsbatch {}".format(output))